@@ -0,0 +1,112 @@
+import streamlit as st
+from datetime import datetime
+from metrics import span
+from results_store import ResultsStore
+
+PAGE_SIZES = (25, 50, 100, 250)
+ALL = "All"
+
+@st.cache_resource
+def get_results_store():
+    # The history written by the optimizer app and `batch_audit.py --results-db`
+    return ResultsStore()
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M")
+
+def filter_select(label, column, store):
+    choice = st.selectbox(label, [ALL] + store.distinct(column), key=f"history_{column}")
+    return None if choice == ALL else choice
+
+def show_older(cursor):
+    st.session_state.history_cursors.append(cursor)
+
+def show_newer():
+    st.session_state.history_cursors.pop()
+
+@st.fragment
+def audit_listing(filters, page_size):
+    # Runs as a fragment: paging, opening a report and picking a trend URL rerun only the listing
+    with span("fragment_run", fragment="audit_listing"):
+        render_audit_listing(filters, page_size)
+
+def render_audit_listing(filters, page_size):
+    # Cursors of the pages visited so far, so "Newer" can step back; any filter change starts over at the newest audit
+    filter_key = tuple(sorted(filters.items())) + (page_size,)
+    if st.session_state.get("history_filter_key") != filter_key:
+        st.session_state.history_filter_key = filter_key
+        st.session_state.history_cursors = [None]
+    cursors = st.session_state.history_cursors
+    store = get_results_store()
+    rows, next_cursor = store.page(page_size, cursors[-1], **filters)
+
+    matching = store.count(**filters)
+    first_row = (len(cursors) - 1) * page_size + 1
+    st.caption(f"{matching:,} matching audits" + (f" · showing {first_row:,}–{first_row + len(rows) - 1:,}" if rows else ""))
+    nav_col1, nav_col2, _ = st.columns([1, 1, 6])
+    nav_col1.button("← Newer", on_click=show_newer, disabled=len(cursors) == 1)
+    nav_col2.button("Older →", on_click=show_older, args=(next_cursor,), disabled=next_cursor is None)
+
+    if not rows:
+        st.info("No audits match these filters yet. Analyses are recorded as they finish in the Content Optimizer "
+                "or with `python batch_audit.py ... --results-db`.")
+    else:
+        st.dataframe([{**row, "analyzed_at": format_time(row["analyzed_at"]),
+                       "score": round(row["score"], 2) if row["score"] is not None else None,
+                       "from_cache": bool(row["from_cache"]) if row["from_cache"] is not None else None}
+                      for row in rows], hide_index=True, use_container_width=True)
+
+        audit_ids = {f"#{row['id']} · {format_time(row['analyzed_at'])} · {row['criterion']} · "
+                     f"{row['url'] or '(pasted text)'}": row["id"] for row in rows}
+        audit_label = st.selectbox("Open an audit:", list(audit_ids), key="history_audit")
+        with st.expander("Report", expanded=False):
+            audit = store.get(audit_ids[audit_label])
+            if audit:
+                st.markdown(audit["result"])
+
+        # --- Score Trend ---
+        st.markdown("---")
+        st.header("2. Score Trend per URL")
+        page_urls = list(dict.fromkeys(row["url"] for row in rows if row["url"]))
+        if page_urls:
+            trend_url = st.selectbox("URL:", page_urls, key="history_trend_url")
+            trend = store.score_trend(trend_url, criterion=filters["criterion"], model_name=filters["model_name"])
+            st.caption("Daily average of the local readiness pre-score (0–1) of the analyzed content.")
+            if len(trend) > 1:
+                st.line_chart({"day": [point["day"] for point in trend], "score": [point["score"] for point in trend]},
+                              x="day", y="score")
+            st.dataframe(trend, hide_index=True, use_container_width=True)
+        else:
+            st.info("None of the audits on this page have a URL.")
+
+# --- Streamlit App ---
+st.set_page_config(layout="wide", page_title="AI Overview Audit History")
+st.title("🗄️ AI Overview Audit History")
+st.markdown("Every analysis from the Content Optimizer and the batch CLI, newest first. "
+            "Only the page on screen is read from the database, so histories of any size stay fast.")
+store = get_results_store()
+
+# --- Filters ---
+st.header("1. Past Audits")
+filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
+with filter_col1:
+    domain = filter_select("Domain", "domain", store)
+with filter_col2:
+    criterion = filter_select("Criterion", "criterion", store)
+with filter_col3:
+    model_name = filter_select("Model", "model_name", store)
+with filter_col4:
+    status = filter_select("Status", "status", store)
+url_col, size_col = st.columns([3, 1])
+with url_col:
+    url_prefix = st.text_input("URL starts with:", key="history_url_prefix", placeholder="e.g. https://example.com/blog/")
+with size_col:
+    page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key="history_page_size")
+filters = {"domain": domain, "criterion": criterion, "model_name": model_name, "status": status,
+           "url_prefix": url_prefix.strip()}
+
+audit_listing(filters, page_size)
+
+st.sidebar.header("🗄️ History Database")
+st.sidebar.caption(f"`{store.path}` · {len(store):,} audits in total")
+st.sidebar.caption("Rows are written in batches, so an analysis shows up here within a second of finishing.")
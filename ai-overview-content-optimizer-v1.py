@@ -1,12 +1,38 @@
 import streamlit as st
-import google.generativeai as genai
-import requests
-from bs4 import BeautifulSoup # for URL fetching
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from change_tracking import PageStateStore
+from crawler import SiteCrawler, iter_sitemap_urls, make_session, parse_url_list
+from extraction import EXTRACTORS
+from llm_cache import ResponseCache
+from gemini_client import DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE, GeminiClient
+from criteria import ANALYSIS_CRITERIA
+from chunking import content_token_budget, estimate_tokens, split_into_chunks
+from optimizer_core import AVAILABLE_MODELS, fetch_content, request_token_limit, run_analysis, run_incremental_analysis
+from metrics import REGISTRY, append_json_log, span, submit_in_context, trace_run
+from dedupe import NearDuplicateIndex
+from prescoring import compute_signals, local_report, readiness_scores, triage
+from corroboration import SUPPORT_SIMILARITY, corroborate, fetch_references, summarize
+from results_store import ResultsStore
+
+MAX_PARALLEL_ANALYSES = 4 # Concurrent Gemini calls for "Analyze all"
+STREAM_REFRESH_SECONDS = 0.25 # How often "Analyze all" repaints streamed partial reports
+MAX_TIMINGS_SHOWN = 10 # Recent calls listed in the sidebar latency table
+MAX_REFERENCE_PAGES = 50 # Reference URLs compared per corroboration check
+MAX_REFERENCE_FETCHES = 32 # Concurrent reference downloads
+MAX_PARALLEL_PAGE_ANALYSES = 8 # Concurrent Gemini calls while crawling; the shared rate limiter still applies
+MAX_CRAWL_REPORTS_SHOWN = 25 # Reports rendered below a crawl; the audit history keeps all of them
 
 # --- Configuration & Helper Functions ---
+@st.cache_resource
+def get_gemini_client():
+    # Shared by every session and worker thread so rate limits and model handles are process-wide
+    return GeminiClient()
+
 def configure_genai(api_key):
     try:
-        genai.configure(api_key=api_key)
+        get_gemini_client().configure(api_key) # No-op when the key hasn't changed since the last rerun
         # You can also list models to verify connection and see available ones
         # models = [m.name for m in genai.list_models()]
         # print(f"Available models: {models}")
@@ -15,19 +41,76 @@ def configure_genai(api_key):
         st.error(f"Error configuring Google AI: {e}")
         return False
 
-def get_content_from_url(url):
+@st.cache_resource
+def get_http_session():
+    # Shared across reruns so single-URL fetches reuse keep-alive connections
+    return make_session()
+
+@st.cache_resource
+def get_page_store():
+    # ETags, fetched text and per-URL analyses kept between sessions for incremental re-audits
+    return PageStateStore()
+
+@st.cache_resource
+def get_results_store():
+    # Audit history shared with the batch CLI; writes are queued and committed in batches
+    return ResultsStore()
+
+def record_audit(page_url, criterion_name, model_name, text, content, from_cache=None, change=None, analyzed_by="gemini"):
+    # The local pre-score of the analyzed content is the score the history dashboard charts per URL
+    score = readiness_scores(compute_signals([content]))[0]
+    get_results_store().add(page_url, criterion_name, model_name, text, score=score, analyzed_by=analyzed_by,
+                            from_cache=from_cache, change=change)
+
+def get_content_from_url(url, extractor=EXTRACTORS["Structured (headings, lists, tables)"]):
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        paragraphs = soup.find_all('p')
-        text_content = "\n".join([p.get_text() for p in paragraphs])
-        return text_content
+        return fetch_content(url, get_http_session(), extractor, page_store=get_page_store())
     except Exception as e:
         st.error(f"Error fetching URL: {e}")
         return None
 
-def analyze_with_gemini(prompt_template, user_content, criterion_name, model_name): # Added model_name
+@st.cache_resource
+def get_response_cache():
+    # One on-disk cache per server process; hit/miss counters survive reruns
+    return ResponseCache()
+
+def request_token_limit_for(model_name):
+    # Uses the per-request cap from the sidebar
+    return request_token_limit(model_name, st.session_state.get("max_request_tokens"))
+
+def record_call_timing(criterion_name, model_name, timing, from_cache):
+    # Keeps the most recent calls in session state for the sidebar latency table
+    timings = st.session_state.setdefault("call_timings", [])
+    timings.append({
+        "criterion": criterion_name,
+        "model": model_name,
+        "cached": from_cache,
+        "ttft_s": round(timing["ttft"], 2) if timing["ttft"] is not None else None,
+        "total_s": round(timing["total"], 2),
+    })
+    del timings[:-MAX_TIMINGS_SHOWN]
+
+def finish_run(trace):
+    # Keeps the breakdown for the sidebar and writes the optional metric exports
+    record = trace.to_record()
+    st.session_state.last_run = record
+    try:
+        if st.session_state.get("metrics_prom_path"):
+            REGISTRY.write_prometheus(st.session_state.metrics_prom_path)
+        if st.session_state.get("metrics_log_path"):
+            append_json_log(st.session_state.metrics_log_path, record)
+    except OSError as e:
+        st.toast(f"Error exporting metrics: {e}", icon="⚠️") # Not st.sidebar: this also runs inside fragments
+
+def gemini_error_message(criterion_name, model_name, error):
+    return (f"Error during Gemini API call for {criterion_name} using model {model_name}: {error}\n\n"
+            "Hint: Ensure the selected model supports 'generateContent' and your API key has access. "
+            "Common models are 'gemini-1.0-pro' or 'gemini-1.5-flash-latest'.")
+
+def analyze_with_gemini(prompt_template, user_content, criterion_name, model_name, generation_config=None, stream_placeholder=None, page_url=None, incremental=False): # Added model_name
+    # When stream_placeholder (an st.empty()) is given, partial markdown is written into it as chunks arrive.
+    # page_url is recorded with the result in the audit history. With incremental set as well, unchanged
+    # pages and sections are not re-sent to Gemini (the "Enter URL" re-audit option).
     if not st.session_state.get("gemini_configured"):
         st.warning("Google AI not configured. Please enter your API key.")
         return None
@@ -35,19 +118,145 @@ def analyze_with_gemini(prompt_template, user_content, criterion_name, model_nam
         st.warning("Please select a Gemini model in the sidebar.")
         return None
     try:
-        st.info(f"Using model: {model_name} for {criterion_name}") # Info about which model is used
-        model = genai.GenerativeModel(model_name) # Use the selected model_name
-        full_prompt = prompt_template.format(user_content=user_content)
-
+        on_chunk = None
+        if stream_placeholder is not None:
+            on_chunk = lambda partial: stream_placeholder.markdown(partial + " ▌")
+        page_store = get_page_store() if page_url and incremental else None
         with st.spinner(f"🤖 Gemini ({model_name.split('/')[-1]}) is analyzing for {criterion_name}..."):
-            response = model.generate_content(full_prompt)
-        return response.text
+            text, from_cache, timing, section_count, change = analyze_page(
+                prompt_template, user_content, criterion_name, model_name, get_response_cache(), get_gemini_client(),
+                page_store, page_url, request_token_limit_for(model_name), generation_config, on_chunk)
+        record_call_timing(criterion_name, model_name, timing, from_cache)
+        record_audit(page_url, criterion_name, model_name, text, user_content, from_cache, change)
+        if change == "unchanged":
+            st.info(f"Page unchanged since the last audit: reusing the stored {criterion_name} analysis")
+        elif change == "sections":
+            st.info(f"Using model: {model_name} for {criterion_name}: revised the previous analysis "
+                    f"from {section_count} changed section(s)")
+        elif from_cache:
+            st.info(f"Using cached result from {model_name} for {criterion_name}")
+        else:
+            st.info(f"Using model: {model_name} for {criterion_name}") # Info about which model is used
+        if section_count > 1 and change != "sections":
+            st.caption(f"Content was over the token budget: analyzed as {section_count} sections and merged.")
+        return text
     except Exception as e:
         # Improved error message to include model name
-        st.error(f"Error during Gemini API call for {criterion_name} using model {model_name}: {e}")
-        st.error("Hint: Ensure the selected model supports 'generateContent' and your API key has access. Common models are 'gemini-1.0-pro' or 'gemini-1.5-flash-latest'.")
+        st.error(gemini_error_message(criterion_name, model_name, e))
         return f"Error: Could not get analysis for {criterion_name} using {model_name}."
 
+def analyze_page(prompt_template, text, criterion_name, model_name, cache, client, page_store, page_url,
+                 request_token_limit, generation_config=None, on_chunk=None):
+    # Safe on worker threads (crawls, "Analyze all"): no Streamlit calls. With a page_store the analysis is
+    # incremental. Returns (text, from_cache, timing, section_count, change); change is None otherwise.
+    if page_store is not None:
+        return run_incremental_analysis(prompt_template, text, criterion_name, model_name, cache, client, page_store,
+                                        page_url, generation_config, on_chunk, request_token_limit)
+    return run_analysis(prompt_template, text, criterion_name, model_name, cache, client, generation_config,
+                        on_chunk, request_token_limit) + (None,)
+
+def analyze_all_criteria(user_content, model_name, criterion_names=None, generation_config=None, stream=False, page_url=None,
+                         incremental=False):
+    # Sends every criterion to Gemini at once and renders each report as soon as it finishes,
+    # so the total wait is roughly the slowest single call rather than the sum of all of them.
+    # Worker threads never touch Streamlit; when streaming, they publish partial text into
+    # `partials` and this (script) thread repaints the placeholders while waiting.
+    criterion_names = criterion_names or list(ANALYSIS_CRITERIA)
+    cache = get_response_cache()
+    client = get_gemini_client()
+    page_store = get_page_store() if page_url and incremental else None
+    request_token_limit = request_token_limit_for(model_name)
+    placeholders = {}
+    for name in criterion_names:
+        st.subheader(ANALYSIS_CRITERIA[name]["heading"])
+        placeholders[name] = st.empty()
+        placeholders[name].info(f"🤖 Waiting for Gemini ({model_name.split('/')[-1]})...")
+
+    partials = {}
+    shown = {}
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_ANALYSES, len(criterion_names))) as pool:
+        futures = {}
+        for name in criterion_names:
+            on_chunk = (lambda partial, name=name: partials.__setitem__(name, partial)) if stream else None
+            future = submit_in_context(pool, analyze_page, ANALYSIS_CRITERIA[name]["prompt"], user_content, name,
+                                       model_name, cache, client, page_store, page_url, request_token_limit,
+                                       generation_config, on_chunk)
+            futures[future] = name
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=STREAM_REFRESH_SECONDS, return_when=FIRST_COMPLETED)
+            for name, partial in list(partials.items()):
+                if name not in results and shown.get(name) != partial:
+                    placeholders[name].markdown(partial + " ▌")
+                    shown[name] = partial
+            for future in done:
+                name = futures[future]
+                try:
+                    text, from_cache, timing, _, change = future.result()
+                    placeholders[name].markdown(text)
+                    results[name] = text
+                    record_call_timing(name, model_name, timing, from_cache)
+                    record_audit(page_url, name, model_name, text, user_content, from_cache, change)
+                except Exception as e:
+                    placeholders[name].error(gemini_error_message(name, model_name, e))
+    return results
+
+@st.fragment
+def corroboration_check():
+    # Runs as a fragment: fetching references and browsing the results reruns only this section
+    with span("fragment_run", fragment="corroboration_check"):
+        render_corroboration_check()
+
+def render_corroboration_check():
+    reference_list = st.text_area(f"Reference URLs (one per line, up to {MAX_REFERENCE_PAGES}):", height=150,
+                                  key="corroboration_urls")
+    if st.button("Check Corroboration"):
+        reference_urls = parse_url_list(reference_list)[:MAX_REFERENCE_PAGES]
+        if not reference_urls:
+            st.warning("Please enter at least one reference URL.")
+        else:
+            crawler = SiteCrawler(max_workers=min(len(reference_urls), MAX_REFERENCE_FETCHES),
+                                  extractor=EXTRACTORS["Structured (headings, lists, tables)"])
+            with st.spinner(f"Fetching {len(reference_urls)} reference pages..."), trace_run("corroboration") as trace:
+                try:
+                    start = time.perf_counter()
+                    references, failures = fetch_references(crawler, reference_urls)
+                    fetched = time.perf_counter()
+                    claims = corroborate(st.session_state.user_content, references)
+                    compared = time.perf_counter()
+                finally:
+                    crawler.close()
+            finish_run(trace)
+            st.session_state.corroboration = {
+                "claims": claims, "references": len(references), "failures": failures,
+                "fetch_s": round(fetched - start, 2), "compare_s": round(compared - fetched, 2),
+            }
+
+    if st.session_state.get("corroboration"):
+        check = st.session_state.corroboration
+        summary = summarize(check["claims"])
+        st.caption(f"Fetched {check['references']} reference pages in {check['fetch_s']}s and compared "
+                   f"{summary['claims']} claims in {check['compare_s']}s. A reference supports a claim when one of "
+                   f"its sentences reaches {SUPPORT_SIMILARITY:.0%} TF-IDF similarity; pages on one domain count once.")
+        if check["failures"]:
+            with st.expander(f"{len(check['failures'])} reference pages could not be fetched"):
+                st.dataframe([{"url": url, "error": error} for url, error in check["failures"]],
+                             hide_index=True, use_container_width=True)
+        if not summary["claims"]:
+            st.info("No claim sentences found in your content (claims are sentences of six words or more).")
+        else:
+            corr_col1, corr_col2, corr_col3 = st.columns(3)
+            corr_col1.metric("Corroborated (2+ sources)", summary["corroborated"])
+            corr_col2.metric("Single source", summary["single_source"])
+            corr_col3.metric("Unique to your page", summary["unique"])
+            st.dataframe([{"claim": claim.claim, "status": claim.status, "sources": len(claim.sources),
+                           "similarity": claim.best_similarity, "closest match": claim.best_passage,
+                           "closest page": claim.best_url} for claim in check["claims"]],
+                         hide_index=True, use_container_width=True)
+            st.caption("Unique claims are either your differentiators or statements that need a citation; "
+                       "corroborated claims are the ones AI Overviews can most safely repeat.")
+
 # --- Streamlit App ---
 st.set_page_config(layout="wide", page_title="AI Overview Content Optimizer")
 st.title("🚀 AI Overview Content Optimizer (with Google AI)")
@@ -56,15 +265,7 @@ st.title("🚀 AI Overview Content Optimizer (with Google AI)")
 st.sidebar.header("🔑 Google AI Configuration")
 api_key_input = st.sidebar.text_input("Enter your Google AI API Key:", type="password", key="api_key_input_val")
 
-# Available models - you might want to fetch this dynamically if you have many or they change often
-# For now, providing common ones. The SDK uses 'models/gemini-1.0-pro', but 'gemini-1.0-pro' often works.
-# The cURL example used 'gemini-2.0-flash'. The current SDK equivalent for "flash" is 'gemini-1.5-flash-latest'.
-# Always check `genai.list_models()` for the exact names if you encounter issues.
-AVAILABLE_MODELS = {
-    "Gemini 1.0 Pro (General Purpose)": "gemini-1.0-pro",
-    "Gemini 1.5 Flash (Fast & Efficient)": "gemini-1.5-flash-latest",
-    # Add other models as needed, e.g., "gemini-1.5-pro-latest"
-}
+# Available models and their input windows live in optimizer_core, shared with the batch CLI
 # Reverse mapping for display if needed, or just use keys for selectbox
 model_display_names = list(AVAILABLE_MODELS.keys())
 
@@ -78,6 +279,17 @@ selected_model_display_name = st.sidebar.selectbox(
     index=model_display_names.index([k for k, v in AVAILABLE_MODELS.items() if v == st.session_state.selected_model_name][0]) # Find current index
 )
 st.session_state.selected_model_name = AVAILABLE_MODELS[selected_model_display_name]
+st.sidebar.number_input("Max input tokens per request (0 = model limit)", min_value=0, value=16000, step=1000,
+                        key="max_request_tokens",
+                        help="Longer pages are split into sections that are analyzed in parallel and then merged, "
+                             "which keeps each call fast and under the model's context window.")
+with st.sidebar.expander("Quota & Rate Limits"):
+    quota_rpm = st.number_input("Requests per minute", min_value=1, value=DEFAULT_REQUESTS_PER_MINUTE, step=5, key="quota_rpm")
+    quota_tpm = st.number_input("Tokens per minute", min_value=1000, value=DEFAULT_TOKENS_PER_MINUTE, step=10000, key="quota_tpm")
+    st.caption("Calls wait for quota instead of failing; 429 and 5xx errors are retried with backoff.")
+get_gemini_client().set_limits(quota_rpm, quota_tpm)
+stream_responses = st.sidebar.checkbox("Stream responses as they are generated", value=True, key="stream_responses",
+                                       help="Shows partial reports token-by-token instead of waiting for the full answer.")
 
 
 if 'gemini_configured' not in st.session_state:
@@ -101,30 +313,208 @@ st.markdown("---")
 # --- Content Input ---
 st.header("1. Provide Your Content")
 input_method = st.radio("How would you like to provide content?",
-                        ("Enter URL", "Paste Text", "Describe Topic/Query"),
+                        ("Enter URL", "Paste Text", "Describe Topic/Query", "Crawl Site (Bulk Audit)"),
                         key="input_method_radio")
 
 user_content_for_analysis = "" # This variable seems unused, direct use of session_state.user_content is better
 
+if input_method in ("Enter URL", "Crawl Site (Bulk Audit)"):
+    extraction_mode = st.selectbox("Text extraction:", list(EXTRACTORS), key="extraction_mode",
+                                   help="Structured keeps headings, lists and tables and strips navigation, "
+                                        "footers and cookie banners. Paragraphs only is the original <p>-only extractor.")
+    page_extractor = EXTRACTORS[extraction_mode]
+
 if input_method == "Enter URL":
     url = st.text_input("Enter the URL of your web page:")
+    st.checkbox("Re-audit: reuse this URL's last analysis when the page or most of its sections are unchanged",
+                value=True, key="incremental_url_analysis",
+                help="Unchanged pages reuse the stored report without a Gemini call, and pages with a few changed "
+                     "sections send only those sections with the previous report to be revised.")
     if url:
         if st.button("Fetch Content from URL"):
-            with st.spinner("Fetching content..."):
-                content = get_content_from_url(url)
-                if content:
-                    st.session_state.user_content = content
-                    st.text_area("Fetched Content (first 1000 chars):", content[:1000]+"...", height=150, disabled=True)
-                else:
-                    st.session_state.user_content = "" # Clear if fetch failed
+            with st.spinner("Fetching content..."), trace_run("fetch_url") as trace:
+                content = get_content_from_url(url, page_extractor)
+            finish_run(trace)
+            if content:
+                st.session_state.user_content = content
+                st.session_state.source_url = url
+                st.text_area("Fetched Content (first 1000 chars):", content[:1000]+"...", height=150, disabled=True)
+            else:
+                st.session_state.user_content = "" # Clear if fetch failed
 elif input_method == "Paste Text":
     pasted_text = st.text_area("Paste your content here:", height=200, key="pasted_content_area")
     if pasted_text: # Update session state on input
         st.session_state.user_content = pasted_text
+        st.session_state.source_url = None
 elif input_method == "Describe Topic/Query":
     query_topic_for_analysis = st.text_input("Describe the main topic or target query for your content:", key="query_topic_input")
     if query_topic_for_analysis: # Update session state on input
         st.session_state.user_content = f"Content Topic: {query_topic_for_analysis}" # Use this as context for Gemini
+        st.session_state.source_url = None
+elif input_method == "Crawl Site (Bulk Audit)":
+    st.markdown("Fetch many pages concurrently from a sitemap or a URL list. Pages are analyzed as they arrive, "
+                f"up to {MAX_PARALLEL_PAGE_ANALYSES} at a time. For recurring audits of thousands of pages, "
+                "`python batch_audit.py` runs the same pipeline without keeping a browser session open.")
+    crawl_source = st.radio("Source:", ("Sitemap URL", "URL List"), horizontal=True, key="crawl_source_radio")
+    if crawl_source == "Sitemap URL":
+        sitemap_url = st.text_input("Sitemap URL (e.g. https://example.com/sitemap.xml):", key="crawl_sitemap_url")
+    else:
+        url_list_text = st.text_area("One URL per line:", height=150, key="crawl_url_list")
+
+    crawl_col1, crawl_col2 = st.columns(2)
+    with crawl_col1:
+        max_pages = st.number_input("Max pages", min_value=1, max_value=50000, value=500, step=100)
+        max_workers = st.slider("Concurrent connections", 1, 64, 16)
+        per_host_limit = st.slider("Max connections per host", 1, 16, 4)
+    with crawl_col2:
+        crawl_delay = st.number_input("Minimum delay between requests to a host (seconds)", min_value=0.0, value=0.0, step=0.1)
+        respect_robots = st.checkbox("Respect robots.txt (including Crawl-delay)", value=True)
+        crawl_criterion = st.selectbox("Analyze each page for:", ["Fetch only"] + list(ANALYSIS_CRITERIA))
+        incremental_crawl = st.checkbox("Only re-analyze changed pages and sections", value=True,
+                                        help="Sends conditional requests using the ETag/Last-Modified from the last crawl, "
+                                             "reuses stored analyses for unchanged pages and re-sends only changed sections.")
+        triage_crawl = st.checkbox("Only send borderline pages to Gemini", value=False,
+                                   help="Scores each page locally (structure, sentence length, citations, freshness...) "
+                                        "and shows a local report for pages that are clearly ready or clearly need work.")
+        dedupe_crawl = st.checkbox("Analyze one page per near-duplicate cluster", value=True,
+                                   help="Templated pages that are nearly identical (faceted listings, boilerplate-heavy "
+                                        "articles) share the analysis of the first such page instead of each costing a call.")
+
+    if st.button("Start Crawl"):
+        crawler = SiteCrawler(max_workers=max_workers, per_host_limit=per_host_limit,
+                              crawl_delay=crawl_delay, respect_robots=respect_robots, extractor=page_extractor,
+                              page_store=get_page_store() if incremental_crawl else None)
+        with trace_run("crawl") as trace:
+            try:
+                if crawl_source == "Sitemap URL":
+                    urls = iter_sitemap_urls(sitemap_url, crawler.session) if sitemap_url else iter(())
+                else:
+                    urls = parse_url_list(url_list_text)
+                crawl_prompt = ANALYSIS_CRITERIA.get(crawl_criterion, {}).get("prompt")
+                if crawl_prompt and not st.session_state.get("gemini_configured"):
+                    st.warning("Google AI not configured. Pages will be fetched but not analyzed.")
+                    crawl_prompt = None
+
+                progress = st.progress(0.0, text="Starting crawl...")
+                crawl_log = []
+                crawl_reports = [] # The first MAX_CRAWL_REPORTS_SHOWN reports; all of them go to the audit history
+                model_name = st.session_state.selected_model_name
+                cache, client = get_response_cache(), get_gemini_client()
+                token_limit = request_token_limit_for(model_name)
+                page_store = get_page_store() if incremental_crawl else None
+                duplicate_index = NearDuplicateIndex() if dedupe_crawl else None
+                representative_feedback = {} # url of each analyzed cluster representative -> its report
+                waiting_duplicates = {} # url of a representative still being analyzed -> [(log_row, text, similarity)]
+                analyses = {} # Future -> (log_row, text) for every page analysis in flight
+
+                def keep_report(url, label, report):
+                    if len(crawl_reports) < MAX_CRAWL_REPORTS_SHOWN:
+                        crawl_reports.append({"url": url, "label": label, "report": report})
+
+                def share_analysis(log_row, text, representative, similarity):
+                    log_row.update(analysis="duplicate", duplicate_of=representative, similarity=round(similarity, 2))
+                    record_audit(log_row["url"], crawl_criterion, model_name, representative_feedback[representative],
+                                 text, analyzed_by="duplicate")
+
+                def submit_analysis(log_row, text):
+                    future = submit_in_context(analysis_pool, analyze_page, crawl_prompt, text, crawl_criterion,
+                                               model_name, cache, client, page_store, log_row["url"], token_limit)
+                    analyses[future] = (log_row, text)
+
+                def collect(done):
+                    # Back on the script thread: Streamlit state, the audit history and waiting duplicates
+                    for future in done:
+                        log_row, text = analyses.pop(future)
+                        parked = waiting_duplicates.pop(log_row["url"], [])
+                        try:
+                            feedback, from_cache, timing, _, change = future.result()
+                        except Exception as e:
+                            log_row.update(analysis="error", analysis_error=str(e))
+                            # Nothing to share: the parked duplicates are analyzed on their own
+                            for duplicate_row, duplicate_text, _ in parked:
+                                submit_analysis(duplicate_row, duplicate_text)
+                            continue
+                        log_row["analysis"] = change or ("cached" if from_cache else "gemini")
+                        record_call_timing(crawl_criterion, model_name, timing, from_cache)
+                        record_audit(log_row["url"], crawl_criterion, model_name, feedback, text, from_cache, change)
+                        keep_report(log_row["url"], crawl_criterion, feedback)
+                        if duplicate_index is not None:
+                            representative_feedback[log_row["url"]] = feedback
+                            for duplicate_row, duplicate_text, similarity in parked:
+                                share_analysis(duplicate_row, duplicate_text, log_row["url"], similarity)
+
+                # Pages stream in as they finish downloading and their analyses run on a bounded pool, so the
+                # crawler keeps fetching while Gemini works; the crawl only waits when the pool is saturated
+                analysis_pool = ThreadPoolExecutor(max_workers=MAX_PARALLEL_PAGE_ANALYSES, thread_name_prefix="crawl-analysis")
+                try:
+                    for done_count, result in enumerate(crawler.crawl(urls, max_pages=int(max_pages)), start=1):
+                        log_row = {"url": result.url, "status": result.status, "chars": len(result.text),
+                                   "not_modified": result.not_modified, "seconds": round(result.elapsed, 2),
+                                   "error": result.error}
+                        crawl_log.append(log_row)
+                        collect([future for future in analyses if future.done()])
+                        progress.progress(min(done_count / max_pages, 1.0),
+                                          text=f"Fetched {done_count} pages, {len(analyses)} analyses running "
+                                               f"(latest: {result.url})")
+                        triage_label = None
+                        if triage_crawl and result.ok:
+                            signals = compute_signals([result.text])
+                            score = readiness_scores(signals)
+                            triage_label = str(triage(signals, score)[0])
+                            log_row.update(prescore=round(float(score[0]), 2), triage=triage_label)
+                            if crawl_prompt and triage_label != "borderline":
+                                report = local_report(signals, 0, score[0], triage_label)
+                                log_row["analysis"] = "local"
+                                keep_report(result.url, "Local pre-score", report)
+                                record_audit(result.url, crawl_criterion, model_name, report, result.text,
+                                             analyzed_by="local")
+                        if not (crawl_prompt and result.ok and triage_label in (None, "borderline")):
+                            continue
+                        if duplicate_index is not None:
+                            representative, similarity = duplicate_index.add(result.url, result.text)
+                            if representative in representative_feedback:
+                                share_analysis(log_row, result.text, representative, similarity)
+                                continue
+                            if representative in waiting_duplicates:
+                                waiting_duplicates[representative].append((log_row, result.text, similarity))
+                                continue
+                            if representative == result.url:
+                                waiting_duplicates[result.url] = []
+                        submit_analysis(log_row, result.text)
+                        while len(analyses) >= MAX_PARALLEL_PAGE_ANALYSES * 2:
+                            done, _ = wait(analyses, return_when=FIRST_COMPLETED)
+                            collect(done)
+                    while analyses:
+                        progress.progress(1.0, text=f"Fetched {len(crawl_log)} pages, {len(analyses)} analyses running...")
+                        done, _ = wait(analyses, return_when=FIRST_COMPLETED)
+                        collect(done)
+                finally:
+                    analysis_pool.shutdown(wait=False, cancel_futures=True)
+                progress.progress(1.0, text=f"Crawl finished: {len(crawl_log)} pages.")
+                st.session_state.crawl_log = crawl_log
+                st.session_state.crawl_reports = crawl_reports
+            except Exception as e:
+                st.error(f"Error during crawl: {e}")
+            finally:
+                crawler.close()
+        finish_run(trace)
+
+    if st.session_state.get("crawl_log"):
+        failed = sum(1 for row in st.session_state.crawl_log if row["error"])
+        not_modified = sum(1 for row in st.session_state.crawl_log if row.get("not_modified"))
+        duplicates = sum(1 for row in st.session_state.crawl_log if row.get("duplicate_of"))
+        analyzed = sum(1 for row in st.session_state.crawl_log if row.get("analysis") not in (None, "error"))
+        analysis_errors = sum(1 for row in st.session_state.crawl_log if row.get("analysis") == "error")
+        st.caption(f"{len(st.session_state.crawl_log)} pages crawled, {failed} failed, {not_modified} unchanged (HTTP 304), "
+                   f"{analyzed} analyzed ({duplicates} near-duplicates shared an analysis), "
+                   f"{analysis_errors} analysis errors.")
+        st.dataframe(st.session_state.crawl_log, use_container_width=True)
+        crawl_reports = st.session_state.get("crawl_reports", [])
+        if crawl_reports:
+            st.markdown(f"**First {len(crawl_reports)} reports.** Every report is kept in the Audit History.")
+            for crawled in crawl_reports:
+                with st.expander(f"{crawled['label']}: {crawled['url']}"):
+                    st.markdown(crawled["report"])
 
 
 # Store content in session state for reuse
@@ -137,57 +527,43 @@ if st.session_state.user_content and st.session_state.gemini_configured:
     st.markdown("---")
     st.header("2. AI-Powered Content Analysis")
     st.markdown(f"**Using Model: {selected_model_display_name}** (`{st.session_state.selected_model_name}`)")
+    content_tokens = estimate_tokens(st.session_state.user_content)
+    content_budget = content_token_budget(request_token_limit_for(st.session_state.selected_model_name))
+    if content_tokens > content_budget:
+        section_total = len(split_into_chunks(st.session_state.user_content, content_budget))
+        st.caption(f"Content is ~{content_tokens:,} tokens, over the ~{content_budget:,} token budget: "
+                   f"it will be analyzed as {section_total} sections in parallel and merged.")
+    else:
+        st.caption(f"Content is ~{content_tokens:,} tokens (budget ~{content_budget:,}).")
 
 
-    if st.button("Analyze for Clarity & Conciseness"):
-        st.subheader("Clarity & Conciseness Analysis")
-        prompt_clarity = """
-        Your role is an expert content editor specializing in optimizing web text for Google AI Overviews.
-        Analyze the following content for clarity and conciseness, keeping in mind it might be used by Google to generate a summary.
-        Identify 1-2 strengths and provide 2-3 actionable suggestions to improve its suitability for AI summarization.
-        Be specific in your suggestions.
-
-        Content to analyze:
-        ---
-        {user_content}
-        ---
-        """
-        if st.session_state.user_content:
-            feedback = analyze_with_gemini(
-                prompt_clarity,
-                st.session_state.user_content,
-                "Clarity & Conciseness",
-                st.session_state.selected_model_name # Pass selected model
-            )
-            if feedback:
-                st.markdown(feedback)
-        else:
-            st.warning("Please provide content first.")
-
-    if st.button("Analyze for E-E-A-T Signals"):
-        st.subheader("E-E-A-T (Experience, Expertise, Authoritativeness, Trustworthiness) Analysis")
-        prompt_eeat = """
-        Your role is an SEO expert focusing on Google's E-E-A-T guidelines for AI Overviews.
-        Review the provided content. What signals of Experience, Expertise, Authoritativeness, and Trustworthiness are present?
-        What signals are missing or could be strengthened? Provide 3 specific, actionable recommendations
-        to enhance E-E-A-T for this content in the context of Google AI Overviews.
-
-        Content to analyze:
-        ---
-        {user_content}
-        ---
-        """
-        if st.session_state.user_content:
-            feedback = analyze_with_gemini(
-                prompt_eeat,
-                st.session_state.user_content,
-                "E-E-A-T",
-                st.session_state.selected_model_name # Pass selected model
-            )
-            if feedback:
-                st.markdown(feedback)
-        else:
-            st.warning("Please provide content first.")
+    if st.button(f"⚡ Analyze all ({len(ANALYSIS_CRITERIA)} criteria in parallel)", type="primary"):
+        with trace_run("analyze_all", model=st.session_state.selected_model_name) as trace:
+            analyze_all_criteria(st.session_state.user_content, st.session_state.selected_model_name, stream=stream_responses,
+                                 page_url=st.session_state.get("source_url"),
+                                 incremental=st.session_state.get("incremental_url_analysis", False))
+        finish_run(trace)
+
+    for criterion_name, criterion in ANALYSIS_CRITERIA.items():
+        if st.button(criterion["button_label"]):
+            st.subheader(criterion["heading"])
+            if st.session_state.user_content:
+                report_placeholder = st.empty()
+                with trace_run("analyze", criterion=criterion_name, model=st.session_state.selected_model_name) as trace:
+                    feedback = analyze_with_gemini(
+                        criterion["prompt"],
+                        st.session_state.user_content,
+                        criterion_name,
+                        st.session_state.selected_model_name, # Pass selected model
+                        stream_placeholder=report_placeholder if stream_responses else None,
+                        page_url=st.session_state.get("source_url"),
+                        incremental=st.session_state.get("incremental_url_analysis", False)
+                    )
+                finish_run(trace)
+                if feedback:
+                    report_placeholder.markdown(feedback)
+            else:
+                st.warning("Please provide content first.")
 
     st.markdown("---")
     st.info("Remember: AI suggestions are guidance. Always use your best judgment and knowledge of your audience.")
@@ -201,6 +577,64 @@ elif not st.session_state.user_content:
     st.info("Please provide content using one of the methods above to start the analysis.")
 
 
+# --- Corroboration Section ---
+if st.session_state.user_content:
+    st.markdown("---")
+    st.header("3. Corroboration Check")
+    st.markdown("AI Overviews favour claims that several independent sources agree on. Fetch competitor or "
+                "reference pages and see which of your claims they corroborate and which are unique to your page. "
+                "The comparison runs locally, without Gemini calls.")
+    corroboration_check()
+
+
+st.sidebar.markdown("---")
+st.sidebar.subheader("⚡ Response Cache")
+cache_stats = get_response_cache().stats()
+cache_col1, cache_col2 = st.sidebar.columns(2)
+cache_col1.metric("Hits", cache_stats["hits"])
+cache_col2.metric("Misses", cache_stats["misses"])
+st.sidebar.caption(f"{cache_stats['entries']} cached responses · hit rate {cache_stats['hit_rate']:.0%} · {cache_stats['evictions']} evicted")
+if st.sidebar.button("Clear Response Cache"):
+    get_response_cache().clear()
+    st.sidebar.success("Response cache cleared.")
+
+st.sidebar.subheader("🚦 Gemini Client")
+client_stats = get_gemini_client().stats()
+client_col1, client_col2, client_col3 = st.sidebar.columns(3)
+client_col1.metric("Calls", client_stats["calls"])
+client_col2.metric("Retries", client_stats["retries"])
+client_col3.metric("Queued", client_stats["queue_depth"])
+st.sidebar.caption(f"{client_stats['throttled_seconds']:.1f}s spent waiting on rate limits · {client_stats['failures']} failed calls")
+
+st.sidebar.subheader("🗄️ Audit History")
+st.sidebar.caption(f"{len(get_results_store()):,} audits stored. Browse them and their score trends with "
+                   "`streamlit run ai-overview-audit-history-v1.py`.")
+
+if st.session_state.get("last_run"):
+    last_run = st.session_state.last_run
+    st.sidebar.subheader("🔬 Last Run Breakdown")
+    counters = last_run["counters"]
+    st.sidebar.caption(f"`{last_run['run']}` took {last_run['wall_s']}s wall time · "
+                       f"~{counters.get('prompt_tokens', 0):,} prompt / ~{counters.get('response_tokens', 0):,} response tokens · "
+                       f"{counters.get('cache_hits', 0)} cache hits, {counters.get('cache_misses', 0)} misses")
+    breakdown = [{"stage": stage, **values} for stage, values in last_run["stages"].items()]
+    if breakdown:
+        st.sidebar.dataframe(breakdown, hide_index=True, use_container_width=True)
+        st.sidebar.caption("Stage times are summed across parallel workers, so they can exceed the wall time.")
+
+with st.sidebar.expander("📈 Metrics Export"):
+    st.text_input("Prometheus textfile path", key="metrics_prom_path", placeholder="e.g. /var/lib/node_exporter/burst_seo.prom")
+    st.text_input("JSON log path (one line per run)", key="metrics_log_path", placeholder="e.g. logs/burst_seo_runs.jsonl")
+    st.caption("Written after every fetch/analysis run. Leave empty to disable.")
+    st.download_button("Download Prometheus metrics", REGISTRY.to_prometheus(), file_name="burst_seo.prom", mime="text/plain")
+    st.download_button("Download metrics JSON", json.dumps(REGISTRY.snapshot(), indent=2),
+                       file_name="burst_seo_metrics.json", mime="application/json")
+
+if st.session_state.get("call_timings"):
+    st.sidebar.subheader("⏱️ Recent Gemini Calls")
+    st.sidebar.caption("Time to first token (TTFT) and total time per call, in seconds.")
+    st.sidebar.dataframe(st.session_state.call_timings[::-1], hide_index=True, use_container_width=True)
+
 st.sidebar.markdown("---")
 st.sidebar.caption("This app uses the Google Generative AI SDK. Ensure you have a valid API key and understand the API usage terms and potential costs. Model availability and naming can change; check the official Google AI documentation for the latest model identifiers if you encounter issues.")
 st.sidebar.markdown("To see all available models for your API key, you can temporarily add this to the `configure_genai` function: `print([m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods])` and check your terminal when the app runs with an API key.")
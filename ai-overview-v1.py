@@ -1,4 +1,20 @@
 import streamlit as st
+from metrics import span
+
+@st.cache_resource
+def get_http_session():
+    # Fetching is optional on this page, so requests and the extraction stack load on the first pre-fill
+    from crawler import make_session
+    return make_session(pool_size=1)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def prefill_suggestions(query_topic, page_text):
+    # Same query and page text -> same suggestions, so re-clicking Pre-fill skips the scoring
+    from prescoring import page_signals, readiness_scores, suggest_checks, triage
+    suggested_when, suggested_content, signals = suggest_checks(query_topic, page_text)
+    score = readiness_scores(signals)
+    prescore = {"score": float(score[0]), "triage": str(triage(signals, score)[0]), "signals": page_signals(signals, 0)}
+    return suggested_when, suggested_content, prescore
 
 # Page Configuration
 st.set_page_config(layout="wide", page_title="Google AI Overview Helper", page_icon="🤖")
@@ -111,9 +127,42 @@ st.markdown("Consider these points for your content or a specific query you're t
 
 query_topic = st.text_input("Enter a search query or content topic you're analyzing:")
 
-if query_topic:
+@st.fragment
+def readiness_checker(query_topic):
+    # Runs as a fragment: ticking a checkbox or clicking a button in here reruns only this function,
+    # not the static guide above it
+    with span("fragment_run", fragment="readiness_checker"):
+        render_readiness_checker(query_topic)
+
+def render_readiness_checker(query_topic):
     st.subheader(f"Assessing '{query_topic}':")
 
+    with st.expander("⚡ Pre-fill from your page (local pre-score, no API key needed)"):
+        prescore_url = st.text_input("Page URL:", key="prescore_url")
+        prescore_text = st.text_area("...or paste the page text:", height=120, key="prescore_text")
+        if st.button("Pre-fill Checklist"):
+            page_text = prescore_text
+            if prescore_url and not page_text:
+                try:
+                    from optimizer_core import fetch_content
+                    page_text = fetch_content(prescore_url, get_http_session())
+                except Exception as e:
+                    st.error(f"Error fetching URL: {e}")
+            if page_text:
+                suggested_when, suggested_content, st.session_state.prescore = prefill_suggestions(query_topic, page_text)
+                # Widget state has to be set before the checkboxes below are created
+                for q, value in suggested_when.items():
+                    st.session_state[f"when_{q}"] = value
+                for q, value in suggested_content.items():
+                    st.session_state[f"content_{q}"] = value
+        if st.session_state.get("prescore"):
+            prescore = st.session_state.prescore
+            st.metric("Local readiness score", f"{prescore['score']:.2f}", prescore["triage"].replace("_", " "),
+                      delta_color="off")
+            st.dataframe([{"signal": name, "value": round(value, 2) if isinstance(value, float) else value}
+                          for name, value in prescore["signals"].items()], use_container_width=True, hide_index=True)
+            st.caption("Checks that need outside knowledge (source availability, niche topics, policy) are left for you to tick.")
+
     checks_when = {
         "Is it primarily an informational query (how-to, what-is, pros/cons)?": False,
         "Does it potentially require synthesizing info from multiple sources?": False,
@@ -158,9 +207,15 @@ if query_topic:
         else:
             st.warning(f"Your content might need significant improvement in E-E-A-T, relevance, or clarity to be featured in AI Overviews for '{query_topic}'.")
 
+        if st.session_state.get("prescore"):
+            st.caption(f"Local pre-score of your page: {st.session_state.prescore['score']:.2f} "
+                       f"({st.session_state.prescore['triage'].replace('_', ' ')}).")
         st.caption("Disclaimer: This is a simplified assessment. Google's actual process is complex and dynamic.")
 
 
+if query_topic:
+    readiness_checker(query_topic)
+
 st.markdown("---")
 
 # --- Important Considerations ---
@@ -0,0 +1,22 @@
+"""One multipage app for the AI Overview tools.
+
+    streamlit run app.py
+
+Each page is still a standalone script (``streamlit run <page>.py`` works too).
+Only the page being viewed is executed, so the Content Optimizer's imports,
+and the Gemini SDK behind them, are not loaded until that page is opened.
+Every page run is timed into the metrics registry as the ``page_run`` stage.
+"""
+import streamlit as st
+
+from metrics import span
+
+PAGES = [
+    st.Page("ai-overview-v1.py", title="AI Overview Helper", icon="🤖", default=True),
+    st.Page("ai-overview-content-optimizer-v1.py", title="Content Optimizer", icon="🚀"),
+    st.Page("ai-overview-audit-history-v1.py", title="Audit History", icon="🗄️"),
+]
+
+page = st.navigation(PAGES)
+with span("page_run", page=page.title):
+    page.run()
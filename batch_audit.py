@@ -0,0 +1,466 @@
+"""Headless batch audits: fetch -> analyze over many URLs or texts, streaming JSONL out.
+
+    python batch_audit.py urls.csv -o results.jsonl --criterion "E-E-A-T" --workers 16
+    python batch_audit.py pages.jsonl -o results.jsonl --model gemini-1.5-flash-latest
+
+Input is a CSV (header row with a ``url`` and/or ``text`` column, optional ``id``)
+or JSONL (one object per line with the same keys). Every (item, criterion) pair
+produces one JSON line in the output as soon as it finishes. The output file is
+also the checkpoint: re-running the same command skips pairs that already have a
+successful record, so an interrupted run resumes where it stopped. Failed pairs
+are retried on the next run; when a pair appears more than once, the last record wins.
+
+For weekly re-audits pass --incremental and a fresh output file: URLs are
+fetched with conditional GETs, pages whose content is unchanged since the last
+run reuse the stored analysis, and changed pages send only their changed
+sections back to Gemini. Each record's ``change`` field says which happened.
+
+With --triage, every page is first scored locally (prescoring.py) and only
+borderline pages are sent to Gemini; clear-cut ones get a local report instead
+(``analyzed_by: "local"``).
+
+With --dedupe, near-duplicate pages (templated listings, boilerplate-heavy
+articles) are clustered as they arrive; only the first page of each cluster
+is analyzed and the rest copy its result (``duplicate_of`` names it).
+
+With --results-db, every record is also added to the audit history database
+(results_store.py) that the Audit History dashboard pages through.
+
+The API key is read from --api-key or the GOOGLE_API_KEY environment variable.
+"""
+import argparse
+import contextvars
+import csv
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from change_tracking import DEFAULT_STATE_PATH, PageStateStore
+from crawler import SiteCrawler
+from criteria import ANALYSIS_CRITERIA
+from dedupe import DEFAULT_THRESHOLD, ClusterResults, NearDuplicateIndex
+from extraction import extract_paragraph_text, extract_structured_text
+from gemini_client import DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE, GeminiClient
+from llm_cache import DEFAULT_CACHE_PATH, ResponseCache
+from metrics import REGISTRY, append_json_log, count, trace_run
+from optimizer_core import AVAILABLE_MODELS, request_token_limit, run_analysis, run_incremental_analysis
+from prescoring import compute_signals, local_report, readiness_scores, triage
+from results_store import DEFAULT_RESULTS_PATH, ResultsStore
+
+CLI_EXTRACTORS = {"structured": extract_structured_text, "paragraphs": extract_paragraph_text}
+PROGRESS_EVERY = 25 # Items between progress lines on stderr
+FSYNC_EVERY = 50 # Records between fsyncs of the output file
+METRICS_EVERY = 100 # Items between rewrites of the Prometheus textfile
+
+
+def item_id(row):
+    if row.get("id"):
+        return str(row["id"])
+    if row.get("url"):
+        return row["url"]
+    return "text:" + hashlib.sha1(row["text"].encode("utf-8")).hexdigest()[:16]
+
+
+def read_items(path):
+    # Yields {"id", "url", "text"} dicts lazily so 20k-row inputs are never held in memory at once
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            url = (row.get("url") or "").strip()
+            text = row.get("text") or ""
+            if not url and not text.strip():
+                continue
+            item = {"url": url, "text": text, "id": row.get("id")}
+            item["id"] = item_id(item)
+            yield item
+
+
+def load_checkpoint(output_path):
+    # Completed (id, criterion) pairs from a previous run. A torn final line (the process was
+    # killed mid-write) is cut off so appended records start on a clean line.
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+    for line in data.splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("status") == "ok":
+            done.add((record["id"], record["criterion"]))
+    return done
+
+
+class JsonlWriter:
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._since_sync = 0
+        self.written = 0
+
+    def write(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            self.written += 1
+            self._since_sync += 1
+            if self._since_sync >= FSYNC_EVERY:
+                os.fsync(self._file.fileno())
+                self._since_sync = 0
+
+    def close(self):
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+
+@dataclass
+class ParkedDuplicate:
+    # A near-duplicate waiting for its cluster representative's records
+    item: dict
+    text: str
+    pending_criteria: list
+    page_fields: dict
+    rep_id: str
+    similarity: float
+    cluster: Future
+
+
+class BatchAuditor:
+    def __init__(self, client, cache, crawler, model_name, criteria, max_request_tokens=None, on_trace=None,
+                 page_store=None, triage_pages=False, dedupe_index=None, results_store=None):
+        self.client = client
+        self.cache = cache
+        self.crawler = crawler
+        self.model_name = model_name
+        self.criteria = criteria
+        self.token_limit = request_token_limit(model_name, max_request_tokens)
+        self.on_trace = on_trace # Receives each item's metrics.RunTrace once the item is done
+        self.page_store = page_store # Set for incremental audits of URL items
+        self.triage_pages = triage_pages # Pre-score locally and only send borderline pages to Gemini
+        self.dedupe_index = dedupe_index # Set to analyze one page per near-duplicate cluster
+        self.results_store = results_store # Set to keep every record in the audit history database
+        self.cluster_results = ClusterResults()
+        self._dedupe_lock = threading.Lock()
+
+    def _record(self, item, criterion, **fields):
+        record = {
+            "id": item["id"],
+            "url": item["url"] or None,
+            "criterion": criterion,
+            "model": self.model_name,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        record.update(fields)
+        return record
+
+    def submit(self, pool, item, pending_criteria):
+        # Audits one item, every outstanding criterion, on the pool. Returns two Futures: the list of output
+        # records, which never fails for an audit error, and `released`, which resolves once the item stops
+        # holding a worker, to True when it was parked. A near-duplicate whose representative is still being
+        # analyzed is parked on the representative's cluster Future and picked up by a done-callback.
+        records, released = Future(), Future()
+        pool.submit(self._run, pool, item, pending_criteria, records, released)
+        return records, released
+
+    def _run(self, pool, item, pending_criteria, records, released):
+        if not records.set_running_or_notify_cancel():
+            released.set_result(False)
+            return
+        try:
+            with trace_run("batch_item", id=item["id"], model=self.model_name) as trace:
+                outcome = self._audit(item, pending_criteria)
+                # Keeps the item's trace current for the spans of whatever the callback still has to run
+                context = contextvars.copy_context()
+            if isinstance(outcome, ParkedDuplicate):
+                released.set_result(True)
+                outcome.cluster.add_done_callback(lambda _: context.run(self._resume, pool, outcome, trace, records))
+            else:
+                released.set_result(False)
+                self._finish(outcome, trace, records)
+        except BaseException as e:
+            if not released.done():
+                released.set_result(False)
+            records.set_exception(e)
+
+    def _resume(self, pool, parked, trace, records):
+        # Runs on whichever thread completed the representative, so it only copies the shared records;
+        # criteria the representative failed on are analyzed on the pool like any other item
+        try:
+            shared, remaining = self._share(parked)
+            if not remaining:
+                self._finish(shared, trace, records)
+                return
+            pool.submit(contextvars.copy_context().run, self._analyze_remaining, parked, remaining, shared, trace,
+                        records)
+        except BaseException as e:
+            records.set_exception(e)
+
+    def _analyze_remaining(self, parked, remaining, shared, trace, records):
+        try:
+            self._finish(shared + self._analyze(parked.item, parked.text, remaining, parked.page_fields), trace, records)
+        except BaseException as e:
+            records.set_exception(e)
+
+    def _finish(self, item_records, trace, records):
+        if self.on_trace is not None:
+            self.on_trace(trace)
+        if self.results_store is not None:
+            self._store(item_records)
+        records.set_result(item_records)
+
+    def _store(self, records):
+        # Queued, not written: the store commits rows from all workers in batches on its own thread
+        for record in records:
+            analyzed_by = record.get("analyzed_by") or ("duplicate" if record.get("duplicate_of") else "gemini")
+            if record["status"] != "ok":
+                analyzed_by = None
+            self.results_store.add(record["url"], record["criterion"], record["model"],
+                                   record.get("result") or record.get("error"), status=record["status"],
+                                   score=record.get("prescore"), analyzed_by=analyzed_by,
+                                   from_cache=record.get("from_cache"), change=record.get("change"))
+
+    def _audit(self, item, pending_criteria):
+        text = item["text"]
+        fetch_seconds = None
+        not_modified = None
+        if item["url"] and not text:
+            result = self.crawler.fetch(item["url"])
+            fetch_seconds = round(result.elapsed, 3)
+            if not result.ok:
+                error = result.error or "No extractable text"
+                return [self._record(item, criterion, status="error", stage="fetch", error=error,
+                                     http_status=result.status) for criterion in pending_criteria]
+            text = result.text
+            not_modified = result.not_modified
+
+        page_fields = {"not_modified": not_modified, "content_chars": len(text), "fetch_s": fetch_seconds}
+        if self.triage_pages or self.results_store is not None:
+            # The pre-score doubles as the score the audit history charts over time
+            signals = compute_signals([text])
+            score = readiness_scores(signals)
+            page_fields["prescore"] = round(float(score[0]), 3)
+        if self.triage_pages:
+            label = str(triage(signals, score)[0])
+            page_fields["triage"] = label
+            if label != "borderline":
+                report = local_report(signals, 0, score[0], label)
+                return [self._record(item, criterion, status="ok", result=report, analyzed_by="local", **page_fields)
+                        for criterion in pending_criteria]
+
+        if self.dedupe_index is None:
+            return self._analyze(item, text, pending_criteria, page_fields)
+        # The index lookup and the representative's Future are created under one lock, so a
+        # duplicate never looks for a representative that has not registered yet
+        with self._dedupe_lock:
+            rep_id, similarity = self.dedupe_index.add(item["id"], text)
+            is_representative = rep_id == item["id"]
+            cluster = self.cluster_results.start(rep_id) if is_representative else self.cluster_results.get(rep_id)
+        if is_representative:
+            records = []
+            try:
+                records = self._analyze(item, text, pending_criteria, page_fields)
+            finally:
+                cluster.set_result(records)
+            return records
+
+        if cluster is None:
+            # The representative's result was evicted from cluster_results
+            return self._analyze(item, text, pending_criteria, page_fields)
+        return ParkedDuplicate(item, text, pending_criteria, page_fields, rep_id, similarity, cluster)
+
+    def _share(self, parked):
+        # The representative's successful records copied onto the duplicate, and the criteria it failed on
+        shared = {record["criterion"]: record for record in parked.cluster.result() if record["status"] == "ok"}
+        records = [self._record(parked.item, criterion, status="ok", result=shared[criterion]["result"],
+                                duplicate_of=parked.rep_id, similarity=round(parked.similarity, 3), **parked.page_fields)
+                   for criterion in parked.pending_criteria if criterion in shared]
+        count("duplicate_analyses_skipped", len(records), model=self.model_name)
+        return records, [criterion for criterion in parked.pending_criteria if criterion not in shared]
+
+    def _analyze(self, item, text, criteria, page_fields):
+        incremental = self.page_store is not None and bool(item["url"])
+        records = []
+        for criterion in criteria:
+            try:
+                change = None
+                if incremental:
+                    output, from_cache, timing, sections, change = run_incremental_analysis(
+                        self.criteria[criterion]["prompt"], text, criterion, self.model_name,
+                        self.cache, self.client, self.page_store, item["url"], request_token_limit=self.token_limit)
+                else:
+                    output, from_cache, timing, sections = run_analysis(
+                        self.criteria[criterion]["prompt"], text, criterion, self.model_name,
+                        self.cache, self.client, request_token_limit=self.token_limit)
+                records.append(self._record(
+                    item, criterion, status="ok", result=output, from_cache=from_cache, sections=sections,
+                    change=change, analysis_s=round(timing["total"], 3), **page_fields))
+            except Exception as e:
+                records.append(self._record(item, criterion, status="error", stage="analyze", error=str(e)))
+        return records
+
+
+def run_batch(items, auditor, writer, done, workers, log=sys.stderr):
+    # Bounded window of items holding or queued for a worker: memory stays flat and a Ctrl-C loses at most
+    # `window` items. Parked near-duplicates leave the window, so a long run of one cluster's duplicates
+    # never keeps the next cluster from being submitted while its representative is still running.
+    window = workers * 2
+    criteria = list(auditor.criteria)
+    counts = {"items": 0, "skipped": 0, "ok": 0, "error": 0}
+    start = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="audit")
+    active = set() # `released` Futures of items counted against the window
+    pending = set() # Records Futures of every submitted item not yet written, parked ones included
+    item_iter = iter(items)
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(active) < window:
+                item = next(item_iter, None)
+                if item is None:
+                    exhausted = True
+                    break
+                outstanding = [c for c in criteria if (item["id"], c) not in done]
+                if not outstanding:
+                    counts["skipped"] += 1
+                    continue
+                records, released = auditor.submit(pool, item, outstanding)
+                pending.add(records)
+                active.add(released)
+            if not pending:
+                break
+            finished, _ = wait(pending | active, return_when=FIRST_COMPLETED)
+            active -= finished
+            for future in finished & pending:
+                pending.remove(future)
+                for record in future.result():
+                    writer.write(record)
+                    counts[record["status"]] += 1
+                counts["items"] += 1
+                if counts["items"] % PROGRESS_EVERY == 0:
+                    rate = counts["items"] / (time.perf_counter() - start)
+                    print(f"[{counts['items']} items] ok={counts['ok']} error={counts['error']} "
+                          f"skipped={counts['skipped']} {rate:.1f} items/s "
+                          f"queue={auditor.client.stats()['queue_depth']}", file=log)
+    except KeyboardInterrupt:
+        print("Interrupted: waiting for in-flight items, then exiting. Re-run to resume.", file=log)
+        for future in pending:
+            future.cancel()
+        for future in pending:
+            if not future.cancelled():
+                for record in future.result():
+                    writer.write(record)
+                    counts[record["status"]] += 1
+        raise
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    counts["seconds"] = round(time.perf_counter() - start, 1)
+    return counts
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run AI Overview content audits over many URLs or texts.")
+    parser.add_argument("input", help="CSV or JSONL file with url and/or text columns")
+    parser.add_argument("-o", "--output", required=True, help="JSONL results file (appended to; doubles as the checkpoint)")
+    parser.add_argument("--criterion", action="append", choices=list(ANALYSIS_CRITERIA),
+                        help="Criterion to run (repeatable; default: all)")
+    parser.add_argument("--model", default=AVAILABLE_MODELS["Gemini 1.5 Flash (Fast & Efficient)"],
+                        help="Gemini model name")
+    parser.add_argument("--workers", type=int, default=8, help="Items processed concurrently")
+    parser.add_argument("--per-host", type=int, default=4, help="Max concurrent fetches per host")
+    parser.add_argument("--crawl-delay", type=float, default=0.0, help="Minimum seconds between fetches to one host")
+    parser.add_argument("--ignore-robots", action="store_true", help="Do not check robots.txt")
+    parser.add_argument("--extractor", choices=list(CLI_EXTRACTORS), default="structured")
+    parser.add_argument("--rpm", type=int, default=DEFAULT_REQUESTS_PER_MINUTE, help="Gemini requests-per-minute quota")
+    parser.add_argument("--tpm", type=int, default=DEFAULT_TOKENS_PER_MINUTE, help="Gemini tokens-per-minute quota")
+    parser.add_argument("--max-request-tokens", type=int, default=16000,
+                        help="Split pages above this many input tokens into sections (0 = model limit)")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Response cache file")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Conditional GETs; reuse stored analyses for unchanged pages and re-send only changed sections")
+    parser.add_argument("--state", default=DEFAULT_STATE_PATH, help="Page state file used by --incremental")
+    parser.add_argument("--triage", action="store_true",
+                        help="Pre-score pages locally and only send borderline ones to Gemini")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Analyze one page per near-duplicate cluster and copy its result to the others")
+    parser.add_argument("--dedupe-threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Estimated Jaccard similarity at which pages share an analysis")
+    parser.add_argument("--results-db", nargs="?", const=DEFAULT_RESULTS_PATH,
+                        help=f"Also keep every record in this audit history database (default: {DEFAULT_RESULTS_PATH})")
+    parser.add_argument("--api-key", default=os.environ.get("GOOGLE_API_KEY"), help="Google AI API key")
+    parser.add_argument("--metrics-prom", help="Prometheus textfile to (re)write with stage timings and token counts")
+    parser.add_argument("--metrics-log", help="JSONL file receiving one per-item stage breakdown per line")
+    return parser
+
+
+def make_metrics_sink(args):
+    if not (args.metrics_prom or args.metrics_log):
+        return None
+    lock = threading.Lock()
+    finished = [0]
+
+    def sink(trace):
+        with lock:
+            finished[0] += 1
+            if args.metrics_log:
+                append_json_log(args.metrics_log, trace.to_record())
+            if args.metrics_prom and finished[0] % METRICS_EVERY == 0:
+                REGISTRY.write_prometheus(args.metrics_prom)
+    return sink
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not args.api_key:
+        sys.exit("No API key: pass --api-key or set GOOGLE_API_KEY.")
+
+    client = GeminiClient(args.rpm, args.tpm)
+    client.configure(args.api_key)
+    page_store = PageStateStore(args.state) if args.incremental else None
+    crawler = SiteCrawler(max_workers=args.workers, per_host_limit=args.per_host, crawl_delay=args.crawl_delay,
+                          respect_robots=not args.ignore_robots, extractor=CLI_EXTRACTORS[args.extractor],
+                          page_store=page_store)
+    criteria = {name: ANALYSIS_CRITERIA[name] for name in (args.criterion or ANALYSIS_CRITERIA)}
+    results_store = ResultsStore(args.results_db) if args.results_db else None
+    auditor = BatchAuditor(client, ResponseCache(args.cache), crawler, args.model, criteria,
+                           args.max_request_tokens or None, on_trace=make_metrics_sink(args), page_store=page_store,
+                           triage_pages=args.triage,
+                           dedupe_index=NearDuplicateIndex(args.dedupe_threshold) if args.dedupe else None,
+                           results_store=results_store)
+
+    done = load_checkpoint(args.output)
+    if done:
+        print(f"Resuming: {len(done)} completed (item, criterion) pairs found in {args.output}", file=sys.stderr)
+    writer = JsonlWriter(args.output)
+    try:
+        counts = run_batch(read_items(args.input), auditor, writer, done, args.workers)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    finally:
+        writer.close()
+        crawler.close()
+        if results_store is not None:
+            results_store.close()
+        if args.metrics_prom:
+            REGISTRY.write_prometheus(args.metrics_prom)
+    print(f"Done in {counts['seconds']}s: {counts['items']} items, {counts['ok']} ok, "
+          f"{counts['error']} errors, {counts['skipped']} already complete.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
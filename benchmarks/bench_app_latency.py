@@ -0,0 +1,109 @@
+"""Benchmark the multipage app: cold start and per-interaction latency.
+
+Cold start runs ``app.py`` to its first render in a fresh interpreter per
+repetition (Streamlit's AppTest, no browser) and lists which heavy SDKs that
+loaded; none should, since the default page needs none of them. Interactions
+tick Readiness Checker checkboxes on the AI Overview Helper page and compare
+the ``page_run`` stage (what a full-script rerun costs) with the
+``fragment_run`` stage (what the browser waits for now that the checker is a
+fragment). AppTest always reruns the whole script, so both stages come from
+the same reruns.
+
+    python benchmarks/bench_app_latency.py
+    python benchmarks/bench_app_latency.py --cold-runs 10 --interactions 100
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+HEAVY_MODULES = ("google.generativeai", "requests", "bs4", "numpy")
+QUERY = "how to brew cold brew coffee"
+
+COLD_START = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+app = AppTest.from_file("app.py", default_timeout=60).run()
+done = time.perf_counter()
+print(json.dumps({"import_s": imported - start, "first_run_s": done - imported,
+                  "exceptions": [str(e.value) for e in app.exception],
+                  "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def cold_start(runs):
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", COLD_START % (HEAVY_MODULES,)], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def stage_totals(snapshot, stage, **labels):
+    # (seconds, observations) of one stage in a registry snapshot
+    for entry in snapshot["stages"]:
+        if entry["stage"] == stage and all(entry["labels"].get(k) == v for k, v in labels.items()):
+            return entry["sum_s"], entry["count"]
+    return 0.0, 0
+
+
+def interactions(count):
+    from streamlit.testing.v1 import AppTest
+
+    from metrics import REGISTRY
+
+    os.chdir(REPO_ROOT)
+    app = AppTest.from_file("app.py", default_timeout=60).run()
+    app.text_input[0].input(QUERY).run()
+    before = REGISTRY.snapshot()
+    checkboxes = len(app.checkbox)
+    start = time.perf_counter()
+    for n in range(count):
+        box = app.checkbox[n % checkboxes]
+        (box.uncheck() if box.value else box.check()).run()
+    wall = (time.perf_counter() - start) / count
+    after = REGISTRY.snapshot()
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+
+    def delta(stage, **labels):
+        # Mean of the observations made during the toggles only
+        (seconds_after, runs_after), (seconds_before, runs_before) = (
+            stage_totals(after, stage, **labels), stage_totals(before, stage, **labels))
+        return (seconds_after - seconds_before) / (runs_after - runs_before)
+
+    return wall, delta("page_run", page="AI Overview Helper"), delta("fragment_run", fragment="readiness_checker")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cold-runs", type=int, default=5)
+    parser.add_argument("--interactions", type=int, default=50, help="Checkbox toggles to time")
+    args = parser.parse_args(argv)
+
+    runs = cold_start(args.cold_runs)
+    exceptions = [e for run in runs for e in run["exceptions"]]
+    loaded = sorted({m for run in runs for m in run["loaded"]})
+    print(f"cold start: streamlit import {statistics.median(r['import_s'] for r in runs):.3f}s, "
+          f"first render {statistics.median(r['first_run_s'] for r in runs):.3f}s "
+          f"(median of {args.cold_runs}, fresh interpreter each)")
+    print(f"heavy modules loaded at start: {', '.join(loaded) or 'none'}"
+          + (f"; {len(exceptions)} exceptions: {exceptions[0]}" if exceptions else ""))
+
+    wall, page_run, fragment_run = interactions(args.interactions)
+    print(f"checkbox toggle: full rerun {page_run * 1000:.1f} ms (page_run), "
+          f"fragment rerun {fragment_run * 1000:.1f} ms (fragment_run), "
+          f"{wall * 1000:.1f} ms per AppTest round trip, over {args.interactions} toggles")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Benchmark a corroboration check: fetch reference pages concurrently, compare claims.
+
+Serves the fixtures from the local fixture server with a per-request latency
+standing in for remote sites, fetches --references pages the way the optimizer
+does (one SiteCrawler, one connection per page) and compares the claims of the
+target page with them. Reports fetch time, compare time and the claim verdicts.
+Every fixture page comes from one host, which would count as a single source,
+so --min-sources defaults to 1 here.
+
+    python benchmarks/bench_corroboration.py --references 50 --latency 0.3
+"""
+import argparse
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from corroboration import corroborate, fetch_references, summarize  # noqa: E402
+from crawler import SiteCrawler  # noqa: E402
+from harness import FixtureServer  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--references", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds each fixture request takes")
+    parser.add_argument("--min-sources", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="Compare passes to time (the fetch runs once)")
+    args = parser.parse_args(argv)
+
+    with FixtureServer(latency=args.latency) as server:
+        crawler = SiteCrawler(max_workers=args.references, per_host_limit=args.references, respect_robots=False)
+        try:
+            target = crawler.fetch(server.url(0)).text
+            start = time.perf_counter()
+            references, failures = fetch_references(crawler, [server.url(n) for n in range(1, args.references + 1)])
+            fetch_seconds = time.perf_counter() - start
+        finally:
+            crawler.close()
+
+    compare_seconds = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        claims = corroborate(target, references, min_sources=args.min_sources)
+        compare_seconds.append(time.perf_counter() - start)
+    reference_mb = sum(len(text.encode("utf-8")) for text in references.values()) / (1024 * 1024)
+    summary = summarize(claims)
+    print(f"fetch: {len(references)} pages ({reference_mb:.1f} MB of text) in {fetch_seconds:.2f}s "
+          f"at {args.latency}s latency each, {len(failures)} failed")
+    print(f"compare: {summary['claims']} claims in {min(compare_seconds):.3f}s (best of {args.repeat})")
+    print(f"total: {fetch_seconds + min(compare_seconds):.2f}s")
+    print(f"verdicts: {summary['corroborated']} corroborated, {summary['single_source']} single source, "
+          f"{summary['unique']} unique")
+
+
+if __name__ == "__main__":
+    main()
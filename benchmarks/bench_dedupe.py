@@ -0,0 +1,81 @@
+"""Benchmark the near-duplicate index at crawl scale.
+
+Builds a synthetic site from the fixture text: templates are sections of the
+fixtures, and each page is a template with a fraction of its words replaced.
+Most pages are light edits of a template, as on a templated site, and the
+rest are heavily edited and should stay distinct. Reports pages/sec, the
+cluster count, retained index size and peak RSS growth.
+
+    python benchmarks/bench_dedupe.py --pages 100000
+"""
+import argparse
+import glob
+import os
+import random
+import resource
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from chunking import split_into_chunks  # noqa: E402
+from dedupe import DEFAULT_THRESHOLD, NearDuplicateIndex  # noqa: E402
+from extraction import extract_structured_text  # noqa: E402
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def make_page(template_words, edit_rate, rng):
+    words = list(template_words)
+    for i in rng.sample(range(len(words)), int(len(words) * edit_rate)):
+        words[i] = f"w{rng.getrandbits(32):x}"
+    return " ".join(words)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--pages", type=int, default=20000)
+    parser.add_argument("--template-tokens", type=int, default=800, help="Size of each page template")
+    parser.add_argument("--light-edit", type=float, default=0.005, help="Word edit rate of templated pages")
+    parser.add_argument("--heavy-edit", type=float, default=0.5, help="Word edit rate of distinct pages")
+    parser.add_argument("--distinct-share", type=float, default=0.2, help="Share of pages that are heavily edited")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    texts = [extract_structured_text(open(path, "rb").read())
+             for path in sorted(glob.glob(os.path.join(args.fixtures, "*.html")))]
+    templates = [chunk.split() for text in texts for chunk in split_into_chunks(text, args.template_tokens)]
+    index = NearDuplicateIndex(args.threshold)
+
+    rss_before = _peak_rss_mb()
+    build_seconds = index_seconds = 0.0
+    for number in range(args.pages):
+        start = time.perf_counter()
+        edit_rate = args.heavy_edit if rng.random() < args.distinct_share else args.light_edit
+        page = make_page(templates[number % len(templates)], edit_rate, rng)
+        built = time.perf_counter()
+        index.add(f"https://shop.example.com/catalog/item-{number}", page)
+        build_seconds += built - start
+        index_seconds += time.perf_counter() - built
+    rss_growth = _peak_rss_mb() - rss_before
+
+    stats = index.stats()
+    print(f"{stats['pages']} pages from {len(templates)} templates ({args.distinct_share:.0%} heavily edited)")
+    print(f"index.add: {stats['pages'] / index_seconds:.0f} pages/s (page generation took {build_seconds:.1f}s, not counted)")
+    print(f"clusters: {stats['clusters']} ({stats['duplicates']} duplicates, largest cluster {stats['largest_cluster']})")
+    print(f"index: {stats['index_bytes'] / (1024 * 1024):.1f} MB retained "
+          f"({stats['index_bytes'] / max(stats['clusters'], 1):.0f} bytes per cluster, representative URLs included); "
+          f"peak RSS growth incl. per-page hashing buffers: {rss_growth:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark the HTML extractors over a corpus of saved pages.
+
+Compares the original <p>-only extractor with the structured extractor (lxml and
+BeautifulSoup backends) and reports pages/sec, MB/sec, peak Python heap, peak
+RSS growth and how many pages came out empty (an empty page is never audited). Each extractor runs in its own child process so memory numbers do not
+bleed into each other.
+
+    python benchmarks/bench_extraction.py
+    python benchmarks/bench_extraction.py --fixtures /path/to/saved/html --repeat 50
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import extraction  # noqa: E402
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+BENCH_EXTRACTORS = {
+    "paragraphs (current)": extraction.extract_paragraph_text,
+    "structured/bs4": extraction._extract_bs4,
+}
+if extraction.lxml is not None:
+    BENCH_EXTRACTORS["structured/lxml"] = extraction._extract_lxml
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _measure(name, paths, repeat, queue):
+    extractor = BENCH_EXTRACTORS[name]
+    pages = [open(path, "rb").read() for path in paths]
+    total_bytes = sum(len(page) for page in pages)
+    rss_before = _peak_rss_mb()
+
+    outputs = [extractor(page) for page in pages]  # warm-up, also sizes the output
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            extractor(page)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    for page in pages:
+        extractor(page)
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    page_count = len(pages) * repeat
+    queue.put({
+        "extractor": name,
+        "pages_per_sec": page_count / elapsed,
+        "mb_per_sec": total_bytes * repeat / elapsed / (1024 * 1024),
+        "heap_peak_mb": heap_peak / (1024 * 1024),
+        "rss_growth_mb": _peak_rss_mb() - rss_before,
+        "output_chars": sum(map(len, outputs)),
+        "empty_pages": sum(not output.strip() for output in outputs),
+    })
+
+
+def run(paths, repeat, names):
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for name in names:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_measure, args=(name, paths, repeat, queue))
+        proc.start()
+        results.append(queue.get())
+        proc.join()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="Directory of saved .html pages")
+    parser.add_argument("--repeat", type=int, default=20, help="Passes over the corpus per extractor")
+    parser.add_argument("--extractor", action="append", choices=list(BENCH_EXTRACTORS),
+                        help="Limit the run to these extractors (repeatable)")
+    args = parser.parse_args(argv)
+
+    paths = sorted(glob.glob(os.path.join(args.fixtures, "*.html")))
+    if not paths:
+        parser.error(f"No .html fixtures found in {args.fixtures}")
+    corpus_kb = sum(os.path.getsize(path) for path in paths) / 1024
+    print(f"{len(paths)} fixtures, {corpus_kb:.0f} KiB, {args.repeat} passes\n")
+
+    results = run(paths, args.repeat, args.extractor or list(BENCH_EXTRACTORS))
+    baseline = results[0]["pages_per_sec"]
+    header = f"{'extractor':<22}{'pages/s':>10}{'MB/s':>8}{'speedup':>9}{'heap MB':>9}{'RSS+ MB':>9}{'chars':>9}{'empty':>7}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(f"{row['extractor']:<22}{row['pages_per_sec']:>10.1f}{row['mb_per_sec']:>8.2f}"
+              f"{row['pages_per_sec'] / baseline:>8.2f}x{row['heap_peak_mb']:>9.2f}"
+              f"{row['rss_growth_mb']:>9.1f}{row['output_chars']:>9}{row['empty_pages']:>7}")
+
+
+if __name__ == "__main__":
+    main()
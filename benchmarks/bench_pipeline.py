@@ -0,0 +1,206 @@
+"""End-to-end fetch -> extract -> analyze benchmark that never leaves the machine.
+
+Serves the HTML fixtures from a local HTTP server, swaps Gemini for a stub model
+with configurable latency, error rate and output size, and drives the same
+pipeline the batch CLI uses (SiteCrawler -> run_analysis through GeminiClient and
+the response cache) at several concurrency levels. Reports throughput,
+p50/p95/p99 item latency, retries and memory, and can save/compare JSON results
+so changes can be compared run to run. With --reaudit-changed, each level first
+audits every page once (untimed), edits that fraction of the pages, and times an
+incremental re-audit instead. With --dedupe, near-duplicate pages share one
+analysis (the fixture pages only differ in their <h1>, so they cluster heavily).
+
+    python benchmarks/bench_pipeline.py --pages 200 --concurrency 1,8,32
+    python benchmarks/bench_pipeline.py --error-rate 0.05 --json after.json --compare before.json
+    python benchmarks/bench_pipeline.py --pages 200 --reaudit-changed 0.1
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from batch_audit import BatchAuditor, run_batch  # noqa: E402
+from change_tracking import PageStateStore  # noqa: E402
+from dedupe import NearDuplicateIndex  # noqa: E402
+from crawler import SiteCrawler  # noqa: E402
+from criteria import ANALYSIS_CRITERIA  # noqa: E402
+from gemini_client import GeminiClient  # noqa: E402
+from harness import FixtureServer, stub_model_factory  # noqa: E402
+from llm_cache import ResponseCache  # noqa: E402
+
+MODEL_NAME = "gemini-1.5-flash-latest"
+
+
+def percentile(values, pct):
+    # Nearest-rank percentile; fine for the sample sizes used here
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class _TimedAuditor(BatchAuditor):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    def submit(self, pool, item, pending_criteria):
+        # Item latency runs from submission (so it includes time queued behind the window) to the last record
+        start = time.perf_counter()
+        records, released = super().submit(pool, item, pending_criteria)
+        records.add_done_callback(lambda _: self.latencies.append(time.perf_counter() - start)) # Atomic under the GIL
+        return records, released
+
+
+class _NullWriter:
+    def __init__(self):
+        self.written = 0
+
+    def write(self, record):
+        self.written += 1
+
+
+def run_level(server, concurrency, args, criteria):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # A fresh cache per level so no level benefits from another's responses
+        cache = ResponseCache(os.path.join(cache_dir, "bench.sqlite3"))
+        client = GeminiClient(args.rpm, args.tpm, backoff_base=args.backoff_base,
+                              model_factory=stub_model_factory(
+                                  latency=args.llm_latency, jitter=args.llm_jitter, error_rate=args.error_rate,
+                                  output_chars=args.output_chars, seed=args.seed))
+        page_store = None
+        if args.reaudit_changed is not None:
+            page_store = PageStateStore(os.path.join(cache_dir, "pages.sqlite3"))
+        crawler = SiteCrawler(max_workers=concurrency, per_host_limit=concurrency, page_store=page_store)
+        auditor = _TimedAuditor(client, cache, crawler, MODEL_NAME, criteria, args.max_request_tokens or None,
+                                page_store=page_store, dedupe_index=NearDuplicateIndex() if args.dedupe else None)
+        items = ({"id": server.url(n), "url": server.url(n), "text": ""} for n in range(args.pages))
+
+        calls_before = 0
+        not_modified_before = server.not_modified
+        if page_store is not None:
+            # Baseline audit, then a content update on some pages; only the re-audit is timed
+            run_batch(items, auditor, _NullWriter(), set(), concurrency, log=open(os.devnull, "w"))
+            edited = random.Random(args.seed).sample(range(args.pages), int(args.pages * args.reaudit_changed))
+            server.edit(edited)
+            auditor.latencies = []
+            calls_before = client.stats()["calls"]
+            not_modified_before = server.not_modified
+            items = ({"id": server.url(n), "url": server.url(n), "text": ""} for n in range(args.pages))
+
+        if args.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        counts = run_batch(items, auditor, _NullWriter(), set(), concurrency, log=open(os.devnull, "w"))
+        elapsed = time.perf_counter() - start
+        heap_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024) if args.trace_memory else None
+        if args.trace_memory:
+            tracemalloc.stop()
+        crawler.close()
+
+    latencies = auditor.latencies
+    client_stats = client.stats()
+    return {
+        "concurrency": concurrency,
+        "items": counts["items"],
+        "ok": counts["ok"],
+        "errors": counts["error"],
+        "seconds": elapsed,
+        "items_per_sec": counts["items"] / elapsed if elapsed else 0.0,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "llm_calls": client_stats["calls"] - calls_before,
+        "not_modified": server.not_modified - not_modified_before,
+        "retries": client_stats["retries"],
+        "throttled_s": client_stats["throttled_seconds"],
+        "heap_peak_mb": heap_peak,
+        "rss_peak_mb": _peak_rss_mb(),
+    }
+
+
+def print_table(results, previous=None):
+    previous = {row["concurrency"]: row for row in (previous or [])}
+    header = (f"{'conc':>5}{'items/s':>10}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'errors':>8}"
+              f"{'calls':>7}{'retries':>8}{'RSS MB':>8}{'heap MB':>9}")
+    if previous:
+        header += f"{'Δ items/s':>11}{'Δ p95':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        heap = f"{row['heap_peak_mb']:>9.1f}" if row["heap_peak_mb"] is not None else f"{'-':>9}"
+        line = (f"{row['concurrency']:>5}{row['items_per_sec']:>10.2f}{row['p50_s']:>8.3f}{row['p95_s']:>8.3f}"
+                f"{row['p99_s']:>8.3f}{row['errors']:>8}{row['llm_calls']:>7}{row['retries']:>8}"
+                f"{row['rss_peak_mb']:>8.0f}{heap}")
+        before = previous.get(row["concurrency"])
+        if before:
+            line += (f"{row['items_per_sec'] / before['items_per_sec'] - 1:>+10.1%}"
+                     f"{row['p95_s'] / before['p95_s'] - 1 if before['p95_s'] else 0.0:>+8.1%}")
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=100, help="Pages per concurrency level")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated worker counts")
+    parser.add_argument("--criterion", action="append", choices=list(ANALYSIS_CRITERIA),
+                        help="Criteria per page (repeatable; default: all)")
+    parser.add_argument("--site-latency", type=float, default=0.02, help="Fixture server delay per request (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Mean stub model latency (s)")
+    parser.add_argument("--llm-jitter", type=float, default=0.2, help="± uniform jitter on stub latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub calls that fail with 429")
+    parser.add_argument("--output-chars", type=int, default=1500, help="Stub response size")
+    parser.add_argument("--rpm", type=int, default=100000, help="Client requests-per-minute limit")
+    parser.add_argument("--tpm", type=int, default=10 ** 9, help="Client tokens-per-minute limit")
+    parser.add_argument("--backoff-base", type=float, default=0.05, help="Retry backoff base (s)")
+    parser.add_argument("--max-request-tokens", type=int, default=16000, help="Chunking threshold (0 = model limit)")
+    parser.add_argument("--reaudit-changed", type=float, metavar="FRACTION",
+                        help="Time an incremental re-audit after editing this fraction of the pages")
+    parser.add_argument("--dedupe", action="store_true", help="Analyze one page per near-duplicate cluster")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--trace-memory", action="store_true", help="Also report peak Python heap (slower)")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Previous --json output to diff against")
+    args = parser.parse_args(argv)
+
+    criteria = {name: ANALYSIS_CRITERIA[name] for name in (args.criterion or ANALYSIS_CRITERIA)}
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    print(f"{args.pages} pages x {len(criteria)} criteria per level; stub LLM {args.llm_latency}s "
+          f"±{args.llm_jitter}s, error rate {args.error_rate:.0%}; site latency {args.site_latency}s\n")
+    if args.reaudit_changed is not None:
+        print(f"Timing incremental re-audits after editing {args.reaudit_changed:.0%} of the pages\n")
+
+    results = []
+    with FixtureServer(latency=args.site_latency) as server:
+        for level in levels:
+            results.append(run_level(server, level, args, criteria))
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)["results"]
+    print_table(results, previous)
+    if args.reaudit_changed is not None:
+        for row in results:
+            print(f"conc {row['concurrency']}: {row['not_modified']} of {row['items']} pages answered 304 Not Modified")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark the local pre-scoring engine over the extracted fixture text.
+
+The fixtures are long pages, so by default each one is also cut on section
+boundaries into pages of a more typical size. Scores the corpus at several
+batch sizes (batch size 1 is what a per-page call costs) and reports pages/sec,
+MB/sec and how the pages were triaged.
+
+    python benchmarks/bench_prescoring.py
+    python benchmarks/bench_prescoring.py --page-tokens 0 --batch-sizes 1,1000 --repeat 20
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from collections import Counter
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from chunking import split_into_chunks  # noqa: E402
+from extraction import extract_structured_text  # noqa: E402
+from prescoring import compute_signals, readiness_scores, triage  # noqa: E402
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_pages(fixtures_dir, page_tokens):
+    texts = [extract_structured_text(open(path, "rb").read())
+             for path in sorted(glob.glob(os.path.join(fixtures_dir, "*.html")))]
+    if not page_tokens:
+        return texts
+    return [chunk for text in texts for chunk in split_into_chunks(text, page_tokens)]
+
+
+def score_batches(pages, batch_size):
+    labels = []
+    for start in range(0, len(pages), batch_size):
+        signals = compute_signals(pages[start:start + batch_size])
+        labels.extend(triage(signals, readiness_scores(signals)))
+    return labels
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--page-tokens", type=int, default=2500,
+                        help="Cut fixtures into pages of about this many tokens (0 = whole fixtures)")
+    parser.add_argument("--batch-sizes", default="1,100,1000")
+    parser.add_argument("--repeat", type=int, default=10, help="Copies of the corpus to score")
+    args = parser.parse_args(argv)
+
+    pages = load_pages(args.fixtures, args.page_tokens) * args.repeat
+    total_mb = sum(len(page.encode("utf-8")) for page in pages) / (1024 * 1024)
+    print(f"{len(pages)} pages, {total_mb:.1f} MB of extracted text\n")
+    print(f"{'batch':>7}{'pages/s':>11}{'MB/s':>8}")
+    labels = []
+    for batch_size in (int(size) for size in args.batch_sizes.split(",") if size.strip()):
+        start = time.perf_counter()
+        labels = score_batches(pages, batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"{batch_size:>7}{len(pages) / elapsed:>11.0f}{total_mb / elapsed:>8.1f}")
+    print("\nTriage: " + ", ".join(f"{label} {count}" for label, count in sorted(Counter(labels).items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Offline stand-ins for the two network dependencies: websites and the Gemini API.
+
+``FixtureServer`` serves the saved HTML in ``benchmarks/fixtures`` from a local
+threaded HTTP server. ``/page/<n>`` cycles through the fixtures and stamps the
+page number into its <h1>, so every URL has distinct content and does not
+collapse into one response-cache entry. Responses carry an ETag and honour
+If-None-Match, and ``edit()`` changes one section of chosen pages, so
+incremental re-audits can be measured. ``StubModel`` mimics
+``genai.GenerativeModel`` (``generate_content`` with and without streaming,
+``count_tokens``) with configurable latency, error rate and output size.
+"""
+import glob
+import hashlib
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+STREAM_CHUNKS = 8 # Chunks per streamed stub response
+
+
+class FixtureServer:
+    def __init__(self, fixtures_dir=FIXTURES_DIR, latency=0.0, port=0):
+        paths = sorted(glob.glob(os.path.join(fixtures_dir, "*.html")))
+        if not paths:
+            raise FileNotFoundError(f"No .html fixtures in {fixtures_dir}")
+        self.pages = [open(path, "rb").read() for path in paths]
+        self.latency = latency
+        self.requests = 0
+        self.not_modified = 0
+        self.edits = {} # page number -> revision
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # keep-alive, like real sites
+
+            def do_GET(self):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                if self.path == "/robots.txt":
+                    body = b"User-agent: *\nAllow: /\n"
+                elif self.path.startswith("/page/"):
+                    number = int(self.path.rsplit("/", 1)[-1])
+                    page = server.pages[number % len(server.pages)]
+                    body = page.replace(b"</h1>", b" (page %d)</h1>" % number, 1)
+                    if number in server.edits:
+                        head, _, rest = body.partition(b"</h1>")
+                        rest = rest.replace(b"</p>", b" Updated in revision %d.</p>" % server.edits[number], 1)
+                        body = head + b"</h1>" + rest
+                else:
+                    self.send_error(404)
+                    return
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+                if self.headers.get("If-None-Match") == etag:
+                    server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, number):
+        return f"{self.base_url}/page/{number}"
+
+    def edit(self, numbers):
+        # Changes the first paragraph after the <h1> of each page, as a small weekly content update would
+        for number in numbers:
+            self.edits[number] = self.edits.get(number, 0) + 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class StubQuotaError(Exception):
+    code = 429 # Picked up by gemini_client.is_retryable like a real ResourceExhausted
+
+
+class _StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class _StubTokenCount:
+    def __init__(self, total_tokens):
+        self.total_tokens = total_tokens
+
+
+class StubModel:
+    def __init__(self, model_name, latency=0.5, jitter=0.2, error_rate=0.0, output_chars=1500,
+                 time_to_first_token=0.15, seed=None):
+        self.model_name = model_name
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.output_chars = output_chars
+        self.time_to_first_token = time_to_first_token
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            failed = self._random.random() < self.error_rate
+            latency = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        return failed, latency
+
+    def _text(self, prompt):
+        header = f"Stub analysis by {self.model_name} of a {len(prompt)}-char prompt.\n\n"
+        return (header + "- Suggestion text. " * (self.output_chars // 19 + 1))[:max(self.output_chars, len(header))]
+
+    def generate_content(self, contents, generation_config=None, stream=False, **kwargs):
+        failed, latency = self._draw()
+        if not stream:
+            time.sleep(latency)
+            if failed:
+                raise StubQuotaError("429 Resource has been exhausted (stub)")
+            return _StubResponse(self._text(contents))
+        if failed:
+            time.sleep(self.time_to_first_token)
+            raise StubQuotaError("429 Resource has been exhausted (stub)")
+        return self._stream(self._text(contents), latency)
+
+    def _stream(self, text, latency):
+        time.sleep(min(self.time_to_first_token, latency))
+        step = max(1, len(text) // STREAM_CHUNKS)
+        pause = max(0.0, latency - self.time_to_first_token) / STREAM_CHUNKS
+        for i in range(0, len(text), step):
+            yield _StubResponse(text[i:i + step])
+            time.sleep(pause)
+
+    def count_tokens(self, contents):
+        return _StubTokenCount(len(str(contents)) // 4 + 1)
+
+
+def stub_model_factory(**settings):
+    # GeminiClient(model_factory=...) takes a callable of the model name
+    return lambda model_name: StubModel(model_name, **settings)
@@ -0,0 +1,213 @@
+"""Per-URL page state for incremental re-audits.
+
+For every URL the store keeps the HTTP validators (ETag / Last-Modified) and
+the extracted text from the last fetch, plus, per (criterion, model), the last
+analysis together with a fingerprint of the content it was made from: one
+hash for the whole page and one per section. On a re-audit the crawler sends
+a conditional GET, so unchanged pages come back as a body-less 304. Pages
+whose fingerprint still matches reuse the stored analysis. Pages that did
+change are diffed section by section and only the changed sections go back to
+Gemini, together with the previous analysis to revise.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+
+from chunking import split_sections
+
+DEFAULT_STATE_PATH = os.path.join(".burst_seo_cache", "page_state.sqlite3")
+MAX_CHANGED_FRACTION = 0.5 # Above this share of changed text, a full re-analysis is cheaper and better
+MAX_PARTIAL_UPDATES = 4 # Consecutive section-level revisions before forcing a full re-analysis
+
+UPDATE_PROMPT = """
+        Your role is an expert editor keeping an analysis of a web page for Google AI Overviews up to date.
+        The page was analyzed for "{criterion_name}" before. Since then only the sections listed below have
+        changed; every other section is exactly as it was. Revise the previous analysis: update or drop findings
+        about changed and removed sections, add findings for new content, and keep the findings about unchanged
+        sections as they are. Return the complete revised analysis in the same format as the previous one.
+
+        Previous analysis:
+        ---
+        {previous_analysis}
+        ---
+
+        Changed or added sections:
+        ---
+        {changed_sections}
+        ---
+
+        Removed sections: {removed_sections}
+        """
+
+
+def _normalize(text):
+    # Whitespace-only edits (re-indented templates, trailing spaces) don't count as changes
+    return " ".join(text.split())
+
+
+def content_hash(text):
+    return hashlib.sha256(_normalize(text).encode("utf-8")).hexdigest()
+
+
+def _section_heading(section):
+    first_line = section.lstrip().splitlines()[0] if section.strip() else ""
+    return first_line.lstrip("# ").strip() if first_line.lstrip().startswith("#") else "(introduction)"
+
+
+def section_fingerprints(text):
+    # [heading, hash] per section, in page order
+    return [[_section_heading(section), hashlib.sha1(_normalize(section).encode("utf-8")).hexdigest()[:16]]
+            for section in split_sections(text)]
+
+
+@dataclass
+class SectionDiff:
+    changed: list = field(default_factory=list) # Section texts that are new or edited
+    removed: list = field(default_factory=list) # Headings of sections that no longer exist
+    changed_chars: int = 0
+    total_chars: int = 0
+
+    @property
+    def changed_fraction(self):
+        return self.changed_chars / self.total_chars if self.total_chars else 1.0
+
+
+def diff_sections(previous_fingerprints, text):
+    # Compares section hashes, so moving a section around is not a change but editing one word is
+    old_hashes = {section_hash for _, section_hash in previous_fingerprints}
+    diff = SectionDiff()
+    new_hashes = set()
+    new_headings = set()
+    for section in split_sections(text):
+        section_hash = hashlib.sha1(_normalize(section).encode("utf-8")).hexdigest()[:16]
+        new_hashes.add(section_hash)
+        new_headings.add(_section_heading(section))
+        diff.total_chars += len(section)
+        if section_hash not in old_hashes:
+            diff.changed.append(section)
+            diff.changed_chars += len(section)
+    diff.removed = [heading for heading, section_hash in previous_fingerprints
+                    if section_hash not in new_hashes and heading not in new_headings]
+    return diff
+
+
+def build_update_prompt(criterion_name, previous_analysis, diff):
+    return UPDATE_PROMPT.format(
+        criterion_name=criterion_name,
+        previous_analysis=previous_analysis,
+        changed_sections="\n\n".join(diff.changed) or "(none)",
+        removed_sections=", ".join(diff.removed) or "none",
+    )
+
+
+@dataclass
+class PageSnapshot:
+    url: str
+    etag: str = None
+    last_modified: str = None
+    extractor: str = ""
+    content_hash: str = ""
+    text: str = ""
+
+
+def conditional_headers(snapshot, extractor_name):
+    # A 304 only helps if the stored text came from the same extractor the caller is using now
+    if snapshot is None or snapshot.extractor != extractor_name:
+        return {}
+    headers = {}
+    if snapshot.etag:
+        headers["If-None-Match"] = snapshot.etag
+    if snapshot.last_modified:
+        headers["If-Modified-Since"] = snapshot.last_modified
+    return headers
+
+
+class PageStateStore:
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Shared by crawler and analysis worker threads, serialized by self._lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " extractor TEXT NOT NULL,"
+            " content_hash TEXT NOT NULL,"
+            " content BLOB NOT NULL,"
+            " fetched_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            " url TEXT NOT NULL,"
+            " criterion TEXT NOT NULL,"
+            " model_name TEXT NOT NULL,"
+            " prompt_key TEXT NOT NULL,"
+            " content_hash TEXT NOT NULL,"
+            " sections TEXT NOT NULL,"
+            " result TEXT NOT NULL,"
+            " partial_updates INTEGER NOT NULL DEFAULT 0,"
+            " analyzed_at REAL NOT NULL,"
+            " PRIMARY KEY (url, criterion, model_name))"
+        )
+        self._conn.commit()
+
+    def get_page(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, extractor, content_hash, content FROM pages WHERE url = ?",
+                (url,)).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, extractor, page_hash, content = row
+        return PageSnapshot(url, etag, last_modified, extractor, page_hash, zlib.decompress(content).decode("utf-8"))
+
+    def save_page(self, url, text, extractor_name, etag=None, last_modified=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, extractor, content_hash, content, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, extractor_name, content_hash(text),
+                 zlib.compress(text.encode("utf-8")), time.time()),
+            )
+            self._conn.commit()
+
+    def get_analysis(self, url, criterion, model_name):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT prompt_key, content_hash, sections, result, partial_updates FROM analyses"
+                " WHERE url = ? AND criterion = ? AND model_name = ?",
+                (url, criterion, model_name)).fetchone()
+        if row is None:
+            return None
+        prompt_key, page_hash, sections, result, partial_updates = row
+        return {"prompt_key": prompt_key, "content_hash": page_hash, "sections": json.loads(sections),
+                "result": result, "partial_updates": partial_updates}
+
+    def save_analysis(self, url, criterion, model_name, prompt_key, text, result, partial_updates=0):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses (url, criterion, model_name, prompt_key, content_hash, sections,"
+                " result, partial_updates, analyzed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, criterion, model_name, prompt_key, content_hash(text), json.dumps(section_fingerprints(text)),
+                 result, partial_updates, time.time()),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM pages")
+            self._conn.execute("DELETE FROM analyses")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
@@ -0,0 +1,127 @@
+"""Token budgeting and section-aware chunking for long pages.
+
+Pages whose prompt would exceed the model's input budget are split on
+section boundaries (headings, then paragraphs, then sentences), each chunk is
+analyzed separately, and a final reduce prompt merges the chunk findings.
+Chunk boundaries are content-defined: whether a section closes its chunk is
+decided by a hash of that section alone, not by how the sections before it
+happened to pack. Editing one section therefore changes only the chunk that
+holds it (and, rarely, the next one, when the edit no longer fits and forces an
+early cut), and every other chunk stays byte-identical, so its cached result is
+reused.
+"""
+import hashlib
+import re
+
+CHARS_PER_TOKEN = 4  # Rough average for English prose with Gemini's tokenizer
+PROMPT_RESERVE_TOKENS = 1024  # Room for the criterion prompt around the content
+CHUNK_TARGET_FILL = 0.5  # Average chunk size as a fraction of the budget; the slack absorbs edits
+
+_HEADING_RE = re.compile(r"^\s*#{1,6}\s")  # Markdown-style headings mark section starts
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+CHUNK_CONTENT_TEMPLATE = """(The following is one section of a longer page. Analyze only this section;
+the findings will be merged with those for the other sections.)
+
+{chunk}"""
+
+REDUCE_PROMPT = """
+        Your role is an expert editor consolidating an analysis of a long web page for Google AI Overviews.
+        The page was too long to review in one pass, so each section was analyzed separately for "{criterion_name}".
+        Merge the section findings below into a single report for the whole page. Keep the format the
+        section reports use, remove duplicates, keep the most specific suggestions, and mention which section
+        a suggestion applies to where that helps.
+
+        Section findings:
+        ---
+        {chunk_findings}
+        ---
+        """
+
+
+def estimate_tokens(text):
+    # CHARS_PER_TOKEN holds for Latin-script prose; CJK and other non-ASCII text runs close to one token per character
+    non_ascii = len(text) - len(text.encode("ascii", "ignore"))
+    return (len(text) - non_ascii) // CHARS_PER_TOKEN + non_ascii + 1
+
+
+def content_token_budget(model_limit, max_request_tokens=None):
+    # Input tokens available for page content in one request
+    limit = min(model_limit, max_request_tokens) if max_request_tokens else model_limit
+    return max(limit - PROMPT_RESERVE_TOKENS, 256)
+
+
+def _is_heading(line):
+    return bool(_HEADING_RE.match(line))
+
+
+def split_sections(text):
+    # A section is a heading line plus everything up to the next heading
+    sections = []
+    current = []
+    for line in text.splitlines():
+        if _is_heading(line) and current:
+            sections.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append("\n".join(current))
+    return [section for section in sections if section.strip()]
+
+
+def _split_oversized(block, max_tokens, count_tokens):
+    # Paragraphs first, then sentences, then a hard cut on characters as the last resort
+    for pattern in ("\n", _SENTENCE_RE):
+        parts = block.split(pattern) if isinstance(pattern, str) else pattern.split(block)
+        if len(parts) > 1:
+            joiner = "\n" if isinstance(pattern, str) else " "
+            return _pack(parts, max_tokens, count_tokens, joiner)
+    step = max(len(block) * max_tokens // count_tokens(block), 1)
+    return [block[i:i + step] for i in range(0, len(block), step)]
+
+
+def _ends_chunk(unit, unit_tokens, target_tokens):
+    # Content-defined boundary: a unit closes its chunk with probability unit_tokens / target_tokens,
+    # decided by a hash of the unit itself, so the decision never depends on what came before it
+    digest = int.from_bytes(hashlib.blake2b(unit.encode("utf-8"), digest_size=8).digest(), "big")
+    return digest < unit_tokens / target_tokens * 2 ** 64
+
+
+def _pack(units, max_tokens, count_tokens, joiner="\n"):
+    # Fills chunks with whole units up to content-defined boundaries (about CHUNK_TARGET_FILL of
+    # max_tokens on average). A chunk is only cut early when the next unit would not fit, and a
+    # unit that is too big on its own is split into chunks of its own.
+    target_tokens = max(max_tokens * CHUNK_TARGET_FILL, 1)
+    chunks = []
+    current = []
+    current_tokens = 0
+    for unit in units:
+        unit_tokens = count_tokens(unit)
+        if unit_tokens > max_tokens or (current and current_tokens + unit_tokens > max_tokens):
+            if current:
+                chunks.append(joiner.join(current))
+                current, current_tokens = [], 0
+            if unit_tokens > max_tokens:
+                chunks.extend(_split_oversized(unit, max_tokens, count_tokens))
+                continue
+        current.append(unit)
+        current_tokens += unit_tokens
+        if _ends_chunk(unit, unit_tokens, target_tokens):
+            chunks.append(joiner.join(current))
+            current, current_tokens = [], 0
+    if current:
+        chunks.append(joiner.join(current))
+    return chunks
+
+
+def split_into_chunks(text, max_tokens, count_tokens=estimate_tokens):
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    return _pack(split_sections(text), max_tokens, count_tokens)
+
+
+def build_reduce_prompt(criterion_name, chunk_results):
+    findings = "\n\n".join(
+        f"### Section {i}\n{result.strip()}" for i, result in enumerate(chunk_results, start=1)
+    )
+    return REDUCE_PROMPT.format(criterion_name=criterion_name, chunk_findings=findings)
@@ -0,0 +1,225 @@
+"""Concurrent site crawler used by the optimizer's bulk audit mode.
+
+Fetches pages from a sitemap.xml or a plain URL list over pooled keep-alive
+connections, capping concurrency per host and honouring robots.txt and crawl
+delays. Results are yielded as each page arrives so callers can start
+analyzing before the whole crawl is finished. With a ``PageStateStore``
+attached, requests are conditional and pages the server reports as unchanged
+(304) are served from the stored text. ``requests`` is imported when the first
+session is made, so importing this module costs nothing until a fetch happens.
+"""
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from urllib import robotparser
+from urllib.parse import urljoin, urlparse
+
+from change_tracking import conditional_headers
+from extraction import charset_from_content_type, extract_structured_text
+from metrics import count, span, submit_in_context
+
+USER_AGENT = "BurstSEO-Optimizer/1.0 (+https://github.com/BurstSoftware/burst-seo)"
+DEFAULT_TIMEOUT = 10
+MAX_SITEMAP_DEPTH = 3  # sitemap index -> sitemap -> urls is the usual nesting
+
+
+@dataclass
+class CrawlResult:
+    url: str
+    status: int = 0
+    text: str = ""
+    error: str = ""
+    elapsed: float = 0.0
+    not_modified: bool = False # Server answered 304; text is the stored copy
+
+    @property
+    def ok(self):
+        return not self.error and bool(self.text)
+
+
+def make_session(pool_size=16):
+    # One session per crawl so TCP/TLS connections are kept alive and reused.
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=1)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def parse_url_list(raw_text):
+    # One URL per line; blank lines and '#' comments are ignored, duplicates dropped.
+    seen = set()
+    urls = []
+    for line in raw_text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or line in seen:
+            continue
+        seen.add(line)
+        urls.append(line)
+    return urls
+
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def iter_sitemap_urls(sitemap_url, session=None, timeout=DEFAULT_TIMEOUT, _depth=0):
+    # Yields page URLs from a sitemap, following sitemap indexes a few levels deep.
+    session = session or make_session(pool_size=2)
+    response = session.get(sitemap_url, timeout=timeout)
+    response.raise_for_status()
+    root = ET.fromstring(response.content)
+    is_index = _local_name(root.tag) == "sitemapindex"
+    for loc in root.iter():
+        if _local_name(loc.tag) != "loc" or not loc.text:
+            continue
+        loc_url = urljoin(sitemap_url, loc.text.strip())
+        if is_index:
+            if _depth < MAX_SITEMAP_DEPTH:
+                yield from iter_sitemap_urls(loc_url, session, timeout, _depth + 1)
+        else:
+            yield loc_url
+
+
+class _HostState:
+    def __init__(self, max_connections):
+        self.semaphore = threading.BoundedSemaphore(max_connections)
+        self.lock = threading.Lock()
+        self.robots = None
+        self.robots_loaded = False
+        self.next_slot = 0.0
+
+
+class SiteCrawler:
+    def __init__(self, max_workers=16, per_host_limit=4, crawl_delay=0.0,
+                 respect_robots=True, timeout=DEFAULT_TIMEOUT, session=None,
+                 extractor=extract_structured_text, page_store=None):
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.crawl_delay = crawl_delay
+        self.respect_robots = respect_robots
+        self.timeout = timeout
+        self.extractor = extractor
+        self.page_store = page_store
+        self.session = session or make_session(pool_size=max_workers)
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+
+    def _host(self, url):
+        netloc = urlparse(url).netloc.lower()
+        with self._hosts_lock:
+            if netloc not in self._hosts:
+                self._hosts[netloc] = _HostState(self.per_host_limit)
+            return self._hosts[netloc]
+
+    def _load_robots(self, url, host):
+        # Mirrors urllib.robotparser.read(): 401/403 disallow everything, other errors allow everything.
+        parts = urlparse(url)
+        parser = robotparser.RobotFileParser()
+        parser.set_url(f"{parts.scheme}://{parts.netloc}/robots.txt")
+        try:
+            response = self.session.get(parser.url, timeout=self.timeout)
+            if response.status_code in (401, 403):
+                parser.disallow_all = True
+            elif response.status_code >= 400:
+                parser.allow_all = True
+            else:
+                parser.parse(response.text.splitlines())
+        except OSError: # requests.RequestException and its subclasses are IOErrors
+            parser.allow_all = True
+        host.robots = parser
+        host.robots_loaded = True
+
+    def _robots_for(self, url, host):
+        if not host.robots_loaded:
+            with host.lock:
+                if not host.robots_loaded:
+                    self._load_robots(url, host)
+        return host.robots
+
+    def allowed(self, url):
+        if not self.respect_robots:
+            return True
+        return self._robots_for(url, self._host(url)).can_fetch(USER_AGENT, url)
+
+    def _delay_for(self, url, host):
+        delay = self.crawl_delay
+        if self.respect_robots:
+            robots_delay = self._robots_for(url, host).crawl_delay(USER_AGENT)
+            if robots_delay:
+                delay = max(delay, float(robots_delay))
+        return delay
+
+    def _wait_for_slot(self, url, host):
+        # Reserve the next start time for this host so requests are spaced by the crawl delay.
+        delay = self._delay_for(url, host)
+        if delay <= 0:
+            return
+        with host.lock:
+            now = time.monotonic()
+            slot = max(now, host.next_slot)
+            host.next_slot = slot + delay
+        if slot > now:
+            time.sleep(slot - now)
+
+    def fetch(self, url):
+        result = CrawlResult(url=url)
+        start = time.perf_counter()
+        try:
+            if not self.allowed(url):
+                result.error = "Blocked by robots.txt"
+                return result
+            snapshot = self.page_store.get_page(url) if self.page_store is not None else None
+            headers = conditional_headers(snapshot, self.extractor.__name__)
+            host = self._host(url)
+            with host.semaphore:
+                self._wait_for_slot(url, host)
+                with span("fetch"):
+                    response = self.session.get(url, timeout=self.timeout, headers=headers)
+            result.status = response.status_code
+            if response.status_code == 304 and headers:
+                count("not_modified_responses")
+                result.text = snapshot.text
+                result.not_modified = True
+                return result
+            response.raise_for_status()
+            with span("parse"):
+                charset = charset_from_content_type(response.headers.get("Content-Type"))
+                result.text = self.extractor(response.content, charset)
+            if self.page_store is not None:
+                self.page_store.save_page(url, result.text, self.extractor.__name__,
+                                          response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        except Exception as e:
+            result.error = str(e)
+        finally:
+            result.elapsed = time.perf_counter() - start
+        return result
+
+    def crawl(self, urls, max_pages=None):
+        # Keeps a bounded window of in-flight fetches and yields results in completion order,
+        # so memory stays flat however long the URL list is.
+        window = self.max_workers * 2
+        url_iter = iter(urls)
+        submitted = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="crawler") as pool:
+            pending = set()
+            while True:
+                while len(pending) < window and (max_pages is None or submitted < max_pages):
+                    url = next(url_iter, None)
+                    if url is None:
+                        break
+                    pending.add(submit_in_context(pool, self.fetch, url))
+                    submitted += 1
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,54 @@
+"""Registry of analysis criteria the optimizer can run against a page.
+
+Each entry maps a criterion name to its report heading, button label and
+prompt template. Templates take a single ``{user_content}`` placeholder.
+Add a criterion with ``register_criterion`` and it shows up in the
+single-page buttons, the "Analyze all" action and the bulk crawl mode.
+"""
+
+ANALYSIS_CRITERIA = {}
+
+
+def register_criterion(name, heading, prompt, button_label=None):
+    if "{user_content}" not in prompt:
+        raise ValueError(f"Prompt for criterion '{name}' must contain a {{user_content}} placeholder.")
+    ANALYSIS_CRITERIA[name] = {
+        "heading": heading,
+        "button_label": button_label or f"Analyze for {name}",
+        "prompt": prompt,
+    }
+    return ANALYSIS_CRITERIA[name]
+
+
+register_criterion(
+    "Clarity & Conciseness",
+    heading="Clarity & Conciseness Analysis",
+    prompt="""
+        Your role is an expert content editor specializing in optimizing web text for Google AI Overviews.
+        Analyze the following content for clarity and conciseness, keeping in mind it might be used by Google to generate a summary.
+        Identify 1-2 strengths and provide 2-3 actionable suggestions to improve its suitability for AI summarization.
+        Be specific in your suggestions.
+
+        Content to analyze:
+        ---
+        {user_content}
+        ---
+        """,
+)
+
+register_criterion(
+    "E-E-A-T",
+    heading="E-E-A-T (Experience, Expertise, Authoritativeness, Trustworthiness) Analysis",
+    button_label="Analyze for E-E-A-T Signals",
+    prompt="""
+        Your role is an SEO expert focusing on Google's E-E-A-T guidelines for AI Overviews.
+        Review the provided content. What signals of Experience, Expertise, Authoritativeness, and Trustworthiness are present?
+        What signals are missing or could be strengthened? Provide 3 specific, actionable recommendations
+        to enhance E-E-A-T for this content in the context of Google AI Overviews.
+
+        Content to analyze:
+        ---
+        {user_content}
+        ---
+        """,
+)
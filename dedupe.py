@@ -0,0 +1,180 @@
+"""Incremental near-duplicate index for extracted page text.
+
+Templated sites (faceted listings, boilerplate-heavy articles) produce
+thousands of pages that differ only in a few words. Each page is reduced to a
+MinHash signature over its word 5-grams, and signatures are banded for
+locality-sensitive lookup, so adding a page costs the same whether the index
+holds a hundred pages or a million. The first page of each cluster becomes its
+representative; later pages whose estimated Jaccard similarity to a
+representative reaches the threshold join that cluster, so only
+representatives need a model call.
+
+Only representatives keep a signature and the index keeps nothing per page:
+duplicates are counted, not stored, since callers get their representative's
+key back from add() and carry it themselves. Band hashes live in a sorted NumPy
+array plus a small append buffer that is merged in batches, which keeps the
+whole index, representative keys included, under a kilobyte per cluster
+instead of the kilobytes per page that per-band Python dicts would cost.
+"""
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.85 # Estimated Jaccard similarity of 5-gram sets needed to share an analysis
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 16 # 16 bands x 4 rows finds pairs at J=0.85 with ~99.9% probability
+SHINGLE_WORDS = 5
+MAX_SHARED_CLUSTERS = 10000 # Representative results kept for fan-out; older clusters fall back to their own call
+MERGE_EVERY = 4096 # Buffered band entries before they are merged into the sorted arrays
+_PRIME = np.uint64(4294967291) # Largest prime below 2**32, so (a * x + b) never overflows uint64
+_SHINGLE_BLOCK = 8192 # Shingles hashed per step, bounding the temporary (num_perm x block) matrix
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+class NearDuplicateIndex:
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM, bands=DEFAULT_BANDS,
+                 shingle_words=SHINGLE_WORDS, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_words = shingle_words
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, int(_PRIME), num_perm, dtype=np.uint64)[:, None]
+        self._row_mix = rng.integers(1, 2 ** 63, num_perm // bands, dtype=np.uint64)
+        self._band_salt = (np.arange(1, bands + 1, dtype=np.uint64) * _MIX)
+        self._lock = threading.Lock()
+        self._signatures = np.empty((64, num_perm), dtype=np.uint32) # One row per representative
+        self._rep_keys = []
+        self._cluster_sizes = np.empty(64, dtype=np.uint32)
+        self._pages = 0
+        self._sorted_hashes = np.empty(0, dtype=np.uint64)
+        self._sorted_reps = np.empty(0, dtype=np.uint32)
+        self._buffer_hashes = np.empty(MERGE_EVERY, dtype=np.uint64)
+        self._buffer_reps = np.empty(MERGE_EVERY, dtype=np.uint32)
+        self._buffered = 0
+
+    def signature(self, text):
+        # MinHash signature of the text's word shingles, or None if the text has no words
+        words = text.lower().encode("utf-8").split()
+        if not words:
+            return None
+        word_hashes = np.fromiter(map(zlib.crc32, words), dtype=np.uint64, count=len(words))
+        k = min(self.shingle_words, len(word_hashes))
+        shingles = np.zeros(len(word_hashes) - k + 1, dtype=np.uint64)
+        for offset in range(k): # Polynomial combination of k consecutive word hashes (wraps mod 2**64)
+            shingles = shingles * np.uint64(1000003) + word_hashes[offset:len(word_hashes) - k + 1 + offset]
+        shingles = np.unique((shingles ^ (shingles >> np.uint64(32))) & np.uint64(0xFFFFFFFF))
+        signature = np.full(self.num_perm, int(_PRIME), dtype=np.uint64)
+        for start in range(0, len(shingles), _SHINGLE_BLOCK):
+            block = shingles[None, start:start + _SHINGLE_BLOCK]
+            np.minimum(signature, ((self._a * block + self._b) % _PRIME).min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+    def _band_hashes(self, signature):
+        rows = signature.reshape(self.bands, -1).astype(np.uint64)
+        return (rows * self._row_mix).sum(axis=1) ^ self._band_salt
+
+    def _candidates(self, band_hashes):
+        left = np.searchsorted(self._sorted_hashes, band_hashes, side="left")
+        right = np.searchsorted(self._sorted_hashes, band_hashes, side="right")
+        found = [self._sorted_reps[lo:hi] for lo, hi in zip(left, right) if hi > lo]
+        buffered = self._buffer_hashes[:self._buffered]
+        found.append(self._buffer_reps[:self._buffered][np.isin(buffered, band_hashes)])
+        return np.unique(np.concatenate(found))
+
+    def _best_match(self, signature, band_hashes):
+        candidates = self._candidates(band_hashes)
+        if not len(candidates):
+            return None, 0.0
+        similarities = (self._signatures[candidates] == signature).mean(axis=1)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None, float(similarities[best])
+        return int(candidates[best]), float(similarities[best])
+
+    def _add_representative(self, key, signature, band_hashes):
+        rep = len(self._rep_keys)
+        if rep == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.empty_like(self._signatures)])
+            self._cluster_sizes = np.concatenate([self._cluster_sizes, np.empty_like(self._cluster_sizes)])
+        self._signatures[rep] = signature
+        self._rep_keys.append(key)
+        self._cluster_sizes[rep] = 1
+        if self._buffered + self.bands > MERGE_EVERY:
+            self._merge_buffer()
+        self._buffer_hashes[self._buffered:self._buffered + self.bands] = band_hashes
+        self._buffer_reps[self._buffered:self._buffered + self.bands] = rep
+        self._buffered += self.bands
+        return rep
+
+    def _merge_buffer(self):
+        hashes = np.concatenate([self._sorted_hashes, self._buffer_hashes[:self._buffered]])
+        reps = np.concatenate([self._sorted_reps, self._buffer_reps[:self._buffered]])
+        order = np.argsort(hashes, kind="stable")
+        self._sorted_hashes, self._sorted_reps = hashes[order], reps[order]
+        self._buffered = 0
+
+    def add(self, key, text):
+        # Returns (representative_key, similarity). A page that starts a new cluster is its own
+        # representative with similarity 1.0; so is a page with no words, which is never clustered.
+        # Keys are not remembered, so adding a page twice counts it twice.
+        signature = self.signature(text)
+        with self._lock:
+            if signature is None:
+                return key, 1.0
+            self._pages += 1
+            band_hashes = self._band_hashes(signature)
+            rep, similarity = self._best_match(signature, band_hashes)
+            if rep is None:
+                rep, similarity = self._add_representative(key, signature, band_hashes), 1.0
+            else:
+                self._cluster_sizes[rep] += 1
+            return self._rep_keys[rep], similarity
+
+    def __len__(self):
+        return self._pages
+
+    def stats(self):
+        with self._lock:
+            clusters = len(self._rep_keys)
+            # Everything the index retains, the representatives' keys included
+            index_bytes = (self._signatures.nbytes + self._cluster_sizes.nbytes + self._sorted_hashes.nbytes
+                           + self._sorted_reps.nbytes + self._buffer_hashes.nbytes + self._buffer_reps.nbytes
+                           + sys.getsizeof(self._rep_keys) + sum(map(sys.getsizeof, self._rep_keys)))
+            return {
+                "pages": self._pages,
+                "clusters": clusters,
+                "duplicates": self._pages - clusters,
+                "largest_cluster": int(self._cluster_sizes[:clusters].max(initial=0)),
+                "index_bytes": index_bytes,
+            }
+
+
+class ClusterResults:
+    # Representatives' results as Futures, so a duplicate processed on another worker thread can be
+    # finished from its representative's result (with a done-callback, without blocking a worker)
+    # instead of making its own model call. Bounded: when a representative has been evicted, get()
+    # returns None and the duplicate is analyzed on its own.
+    def __init__(self, max_clusters=MAX_SHARED_CLUSTERS):
+        self.max_clusters = max_clusters
+        self._futures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, rep_key):
+        future = Future()
+        with self._lock:
+            self._futures[rep_key] = future
+            if len(self._futures) > self.max_clusters:
+                self._futures.popitem(last=False)
+        return future
+
+    def get(self, rep_key):
+        with self._lock:
+            return self._futures.get(rep_key)
@@ -0,0 +1,205 @@
+"""HTML to text extraction for AI Overview analysis.
+
+``extract_structured_text`` is the default: it drops navigation, footers,
+cookie banners and similar boilerplate and keeps headings, paragraphs,
+lists and tables as lightweight Markdown, so section structure survives into
+the prompt (and into chunking). It uses lxml when installed and falls back
+to BeautifulSoup otherwise. Both decode the page the same way: a byte order
+mark, then the charset of the HTTP Content-Type (``encoding``), then
+``<meta charset>``, then UTF-8 when the bytes are valid UTF-8 and
+Windows-1252 otherwise. ``extract_paragraph_text`` is the original
+``<p>``-only extractor, kept for comparison and as a user-selectable option.
+BeautifulSoup is imported by the functions that use it, so the lxml path
+never loads it.
+"""
+import codecs
+import re
+from functools import lru_cache
+
+try:
+    import lxml.html
+except ImportError: # Optional speed-up; the BeautifulSoup path gives the same output
+    lxml = None
+
+HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+CONTENT_TAGS = HEADING_TAGS + ("p", "li", "tr", "blockquote", "pre", "dt", "dd")
+BOILERPLATE_TAGS = ("script", "style", "noscript", "template", "svg", "iframe",
+                    "nav", "aside", "button", "select")
+# Page-level headers/footers are chrome, but inside <article>/<main> they hold the title and author bio
+PAGE_CHROME_TAGS = ("header", "footer")
+CONTENT_ROOT_TAGS = ("article", "main")
+BOILERPLATE_ROLES = ("navigation", "banner", "contentinfo", "complementary", "dialog", "alertdialog")
+# Whole class/id tokens that mark boilerplate containers (menus, cookie/consent banners, share bars...).
+# Whole tokens only: WordPress tags every post with "tag-<name>"/"category-<name>" classes and themes
+# use state classes like "menu-closed" or "with-sidebar" on the content wrappers themselves.
+BOILERPLATE_TOKENS = frozenset("""
+    nav navbar navigation main-nav main-navigation site-nav site-navigation menu main-menu nav-menu mobile-menu
+    breadcrumb breadcrumbs footer site-footer site-header sidebar widget-area
+    cookie cookies cookie-banner cookie-notice cookie-consent consent gdpr banner popup modal
+    newsletter newsletter-signup subscribe share sharing share-buttons social social-share social-links
+    related related-posts comments comments-area comment-respond advert advertisement ad ads promo
+""".split())
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9_.:-]+)""", re.IGNORECASE)
+_CONTENT_TYPE_CHARSET_RE = re.compile(r"""charset\s*=\s*["']?([A-Za-z0-9_.:-]+)""", re.IGNORECASE)
+_BOMS = ((codecs.BOM_UTF8, "utf-8"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+META_SNIFF_BYTES = 4096 # <meta charset> must appear this early; browsers look at the first 1024 bytes
+
+
+def _codec(label):
+    # Python codec name for a charset label, or None when it is unknown. Browsers read
+    # ISO-8859-1 as its Windows-1252 superset (curly quotes, dashes), and so do we.
+    try:
+        name = codecs.lookup(label).name
+    except LookupError:
+        return None
+    return "cp1252" if name in ("iso8859-1", "ascii") else name
+
+
+def charset_from_content_type(content_type):
+    # The charset declared in an HTTP Content-Type header, or None
+    match = _CONTENT_TYPE_CHARSET_RE.search(content_type or "")
+    return _codec(match.group(1)) if match else None
+
+
+def _detect_encoding(html, encoding=None):
+    for bom, name in _BOMS:
+        if html.startswith(bom):
+            return name
+    if encoding and _codec(encoding):
+        return _codec(encoding)
+    match = _META_CHARSET_RE.search(html, 0, META_SNIFF_BYTES)
+    if match and _codec(match.group(1).decode("ascii")):
+        return _codec(match.group(1).decode("ascii"))
+    try:
+        html.decode("utf-8")
+    except UnicodeDecodeError:
+        return "cp1252"
+    return "utf-8"
+
+
+@lru_cache(maxsize=None)
+def _lxml_parser():
+    return lxml.html.HTMLParser(encoding="utf-8")
+
+
+def _clean(text):
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def _format_block(tag, text, cells=None):
+    if tag in HEADING_TAGS:
+        return "#" * int(tag[1]) + " " + text
+    if tag == "li":
+        return "- " + text
+    if tag == "tr":
+        return "| " + " | ".join(cells) + " |" if cells else ""
+    if tag == "blockquote":
+        return "> " + text
+    return text
+
+
+def extract_paragraph_text(html, encoding=None):
+    # Original extractor: the text of every <p>, nothing else.
+    from bs4 import BeautifulSoup
+    from_encoding = _detect_encoding(html, encoding) if isinstance(html, bytes) else None
+    soup = BeautifulSoup(html, 'html.parser', from_encoding=from_encoding)
+    return "\n".join([p.get_text() for p in soup.find_all('p')])
+
+
+def _is_boilerplate(tag, attrs_get, inside_content_root, contains_content_root):
+    if tag in BOILERPLATE_TAGS:
+        return True
+    if tag in PAGE_CHROME_TAGS and not inside_content_root():
+        return True
+    if (attrs_get("role") or "").lower() in BOILERPLATE_ROLES:
+        return True
+    if attrs_get("aria-hidden") == "true" or attrs_get("hidden") is not None:
+        return True
+    # The class/id heuristic never removes the page itself or a wrapper around the main content
+    if tag == "body" or tag in CONTENT_ROOT_TAGS:
+        return False
+    tokens = " ".join(filter(None, [attrs_get("id"), attrs_get("class")])).lower().split()
+    return not BOILERPLATE_TOKENS.isdisjoint(tokens) and not contains_content_root()
+
+
+def _extract_lxml(html, encoding=None):
+    # lxml would ignore the HTTP charset and read meta-less pages as Latin-1, so it is always handed UTF-8
+    if isinstance(html, bytes):
+        detected = _detect_encoding(html, encoding)
+        if detected != "utf-8":
+            html = html.decode(detected, errors="replace").encode("utf-8")
+        root = lxml.html.document_fromstring(html, parser=_lxml_parser())
+    else:
+        root = lxml.html.document_fromstring(html)
+    body = root.find("body")
+    if body is None:
+        body = root
+    # Drop boilerplate subtrees first so their text can never leak into content blocks
+    doomed = [el for el in body.iter() if isinstance(el.tag, str) and _is_boilerplate(
+              el.tag, el.get, lambda el=el: next(el.iterancestors(*CONTENT_ROOT_TAGS), None) is not None,
+              lambda el=el: next(el.iterdescendants(*CONTENT_ROOT_TAGS), None) is not None)]
+    for el in doomed:
+        if el.getparent() is not None:
+            el.drop_tree()
+
+    blocks = []
+    emitted = set()
+    for el in body.iter(*CONTENT_TAGS):
+        # A <p> inside an <li> (or a <li> inside a <blockquote>...) was already emitted with its parent
+        if any(ancestor in emitted for ancestor in el.iterancestors(*CONTENT_TAGS)):
+            continue
+        emitted.add(el)
+        if el.tag == "tr":
+            cells = [_clean(cell.text_content()) for cell in el.iter("th", "td")]
+            block = _format_block("tr", "", cells)
+        else:
+            text = _clean(el.text_content())
+            block = _format_block(el.tag, text) if text else ""
+        if block:
+            blocks.append(block)
+    return "\n".join(blocks)
+
+
+def _extract_bs4(html, encoding=None):
+    from bs4 import BeautifulSoup
+    from_encoding = _detect_encoding(html, encoding) if isinstance(html, bytes) else None
+    soup = BeautifulSoup(html, "html.parser", from_encoding=from_encoding)
+    body = soup.body or soup
+    for el in body.find_all(True):
+        if el.decomposed:
+            continue
+        attrs_get = lambda name, el=el: " ".join(el.get(name)) if isinstance(el.get(name), list) else el.get(name)
+        if _is_boilerplate(el.name, attrs_get, lambda el=el: el.find_parent(CONTENT_ROOT_TAGS) is not None,
+                           lambda el=el: el.find(CONTENT_ROOT_TAGS) is not None):
+            el.decompose()
+
+    blocks = []
+    for el in body.find_all(CONTENT_TAGS):
+        if el.find_parent(CONTENT_TAGS) is not None:
+            continue
+        if el.name == "tr":
+            cells = [_clean(cell.get_text(" ")) for cell in el.find_all(["th", "td"])]
+            block = _format_block("tr", "", cells)
+        else:
+            text = _clean(el.get_text(" "))
+            block = _format_block(el.name, text) if text else ""
+        if block:
+            blocks.append(block)
+    return "\n".join(blocks)
+
+
+def extract_structured_text(html, encoding=None):
+    # html: response bytes (or str); encoding: the charset from the Content-Type header, if any
+    if not html or not html.strip():
+        return ""
+    if lxml is not None:
+        return _extract_lxml(html, encoding)
+    return _extract_bs4(html, encoding)
+
+
+EXTRACTORS = {
+    "Structured (headings, lists, tables)": extract_structured_text,
+    "Paragraphs only (legacy)": extract_paragraph_text,
+}
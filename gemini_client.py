@@ -0,0 +1,238 @@
+"""Shared Gemini client: cached model handles, quota-aware rate limiting and retries.
+
+One ``GeminiClient`` is shared by every analysis in the process (UI buttons,
+"Analyze all", chunked map-reduce and bulk crawls). It configures the SDK once
+per API key, reuses one ``GenerativeModel`` per model name, paces calls with
+token buckets sized to the requests-per-minute and tokens-per-minute quotas,
+and retries 429/5xx errors with jittered exponential backoff so a long batch
+slows down under quota pressure instead of failing halfway through.
+
+The SDK takes the better part of a second to import, so it is loaded when the
+first model handle is built rather than when this module is imported: pages
+that never call Gemini never pay for it.
+"""
+import random
+import threading
+import time
+from functools import lru_cache
+
+from chunking import estimate_tokens
+from metrics import count, span
+
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+
+def _genai():
+    import google.generativeai as genai
+    return genai
+
+
+@lru_cache(maxsize=None)
+def retryable_exceptions():
+    try:
+        from google.api_core import exceptions as api_exceptions
+    except ImportError: # api_core ships with the SDK, but don't make it a hard requirement
+        return ()
+    return (
+        api_exceptions.ResourceExhausted,
+        api_exceptions.TooManyRequests,
+        api_exceptions.InternalServerError,
+        api_exceptions.ServiceUnavailable,
+        api_exceptions.DeadlineExceeded,
+    )
+
+
+def is_retryable(error):
+    if retryable_exceptions() and isinstance(error, retryable_exceptions()):
+        return True
+    code = getattr(error, "code", None)
+    code = getattr(code, "value", code) # grpc StatusCode-style enums
+    return code in RETRYABLE_STATUS_CODES
+
+
+class TokenBucket:
+    # Refills continuously at `per_minute / 60` units per second, holding at most one minute's worth.
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60.0)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        # Seconds until `amount` units are available (requests larger than capacity wait for a full bucket)
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60.0 / self.capacity
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def set_rate(self, per_minute):
+        self._refill(time.monotonic())
+        self.capacity = float(per_minute)
+        self.tokens = min(self.tokens, self.capacity)
+
+
+class RateLimiter:
+    # Requests-per-minute and tokens-per-minute buckets acquired together, so a call only
+    # starts once both quotas have room for it.
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._cond = threading.Condition()
+        self.waiting = 0
+        self.throttled_seconds = 0.0
+
+    def set_limits(self, requests_per_minute, tokens_per_minute):
+        with self._cond:
+            self.requests.set_rate(requests_per_minute)
+            self.tokens.set_rate(tokens_per_minute)
+            self._cond.notify_all()
+
+    def acquire(self, token_count):
+        start = time.monotonic()
+        with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = max(self.requests.wait_time(1, now), self.tokens.wait_time(token_count, now))
+                    if delay <= 0:
+                        self.requests.take(1)
+                        self.tokens.take(token_count)
+                        break
+                    self._cond.wait(delay)
+            finally:
+                self.waiting -= 1
+                self.throttled_seconds += time.monotonic() - start
+
+
+class GeminiClient:
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE_SECONDS, model_factory=None):
+        # model_factory builds a model handle from a name; benchmarks pass an offline stand-in.
+        # Without one, handles come from the SDK's GenerativeModel.
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.model_factory = model_factory
+        self._api_key = None
+        self._sdk_key = None # Key the SDK was last configured with
+        self._models = {}
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.in_flight = 0
+
+    def configure(self, api_key):
+        # Only records the key; the SDK itself is configured (and imported) when the first model is needed
+        with self._lock:
+            if api_key == self._api_key:
+                return
+            self._api_key = api_key
+            self._models.clear() # Handles are bound to the old key's transport
+
+    @property
+    def configured(self):
+        return self._api_key is not None
+
+    def set_limits(self, requests_per_minute, tokens_per_minute):
+        self.limiter.set_limits(requests_per_minute, tokens_per_minute)
+
+    def model(self, model_name):
+        with self._lock:
+            if model_name not in self._models:
+                factory = self.model_factory
+                if factory is None:
+                    genai = _genai()
+                    if self._sdk_key != self._api_key:
+                        genai.configure(api_key=self._api_key)
+                        self._sdk_key = self._api_key
+                    factory = genai.GenerativeModel
+                self._models[model_name] = factory(model_name)
+            return self._models[model_name]
+
+    def count_tokens(self, model_name, prompt):
+        # Paced and retried like generate, since the count decides how a long page is chunked.
+        # It takes a request from the limiter but no tokens: counting does not use the token quota.
+        attempt = 0
+        while True:
+            with span("rate_limit_wait"):
+                self.limiter.acquire(0)
+            try:
+                with span("count_tokens", model=model_name):
+                    return self.model(model_name).count_tokens(prompt).total_tokens
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+            self._retry_pause(model_name, attempt)
+            attempt += 1
+
+    def _backoff(self, attempt):
+        # "Full jitter": sleep a random time up to the exponential cap to spread out retry storms
+        return random.uniform(0, min(BACKOFF_MAX_SECONDS, self.backoff_base * 2 ** attempt))
+
+    def _retry_pause(self, model_name, attempt):
+        with self._stats_lock:
+            self.retries += 1
+        count("llm_retries", model=model_name)
+        time.sleep(self._backoff(attempt))
+
+    def generate(self, model_name, prompt, generation_config=None, on_chunk=None):
+        # With on_chunk set the response is streamed and on_chunk gets the text received so far.
+        # A stream is only retried if it fails before the first chunk, so output is never duplicated.
+        token_count = estimate_tokens(prompt)
+        attempt = 0
+        while True:
+            with span("rate_limit_wait"):
+                self.limiter.acquire(token_count)
+            received_any = False
+            with self._stats_lock:
+                self.calls += 1
+                self.in_flight += 1
+            try:
+                model = self.model(model_name)
+                with span("model_call", model=model_name):
+                    if on_chunk is None:
+                        response = model.generate_content(prompt, generation_config=generation_config)
+                        return response.text
+                    parts = []
+                    for chunk in model.generate_content(prompt, generation_config=generation_config, stream=True):
+                        received_any = True
+                        parts.append(chunk.text)
+                        on_chunk("".join(parts))
+                    return "".join(parts)
+            except Exception as e:
+                error = e
+            finally:
+                with self._stats_lock:
+                    self.in_flight -= 1
+            if received_any or attempt >= self.max_retries or not is_retryable(error):
+                with self._stats_lock:
+                    self.failures += 1
+                raise error
+            self._retry_pause(model_name, attempt)
+            attempt += 1
+
+    def stats(self):
+        return {
+            "queue_depth": self.limiter.waiting,
+            "in_flight": self.in_flight,
+            "throttled_seconds": self.limiter.throttled_seconds,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+        }
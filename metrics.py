@@ -0,0 +1,181 @@
+"""Span-style stage timing and token/cache counters with Prometheus and JSON export.
+
+Pipeline code wraps each stage in ``span("fetch")``, ``span("parse")``,
+``span("prompt_build")``, ``span("cache_lookup")``, ``span("rate_limit_wait")``
+or ``span("model_call")`` and reports counts with ``count("prompt_tokens", n)``.
+Every observation goes into the process-wide ``REGISTRY`` (histograms and
+counters for export). If a ``trace_run`` is active in the current context, the
+observation is also added to that run's ``RunTrace`` so the UI can show a
+per-run breakdown. Use ``submit_in_context`` instead of ``pool.submit`` so
+worker threads report into the caller's run.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRIC_PREFIX = "burst_seo"
+# Upper bounds (seconds) for the stage latency histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_trace = contextvars.ContextVar("burst_seo_run_trace", default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs)
+    return "{" + escaped + "}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {} # (stage, label_key) -> [bucket counts..., sum, count]
+        self._counters = {} # (name, label_key) -> value
+
+    def observe(self, stage, seconds, labels=None):
+        key = (stage, _label_key(labels or {}))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [0] * len(LATENCY_BUCKETS) + [0.0, 0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    hist[i] += 1
+            hist[-2] += seconds
+            hist[-1] += 1
+
+    def inc(self, name, value=1, labels=None):
+        key = (name, _label_key(labels or {}))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            stages = [{"stage": stage, "labels": dict(label_key), "count": hist[-1], "sum_s": round(hist[-2], 6)}
+                      for (stage, label_key), hist in sorted(self._histograms.items())]
+            counters = [{"name": name, "labels": dict(label_key), "value": value}
+                        for (name, label_key), value in sorted(self._counters.items())]
+        return {"stages": stages, "counters": counters}
+
+    def to_prometheus(self):
+        lines = [f"# HELP {METRIC_PREFIX}_stage_seconds Time spent per pipeline stage.",
+                 f"# TYPE {METRIC_PREFIX}_stage_seconds histogram"]
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        for (stage, label_key), hist in histograms:
+            labels = (("stage", stage),) + label_key
+            for bound, bucket_count in zip(LATENCY_BUCKETS, hist):
+                lines.append(f"{METRIC_PREFIX}_stage_seconds_bucket{_format_labels(labels, [('le', bound)])} {bucket_count}")
+            lines.append(f"{METRIC_PREFIX}_stage_seconds_bucket{_format_labels(labels, [('le', '+Inf')])} {hist[-1]}")
+            lines.append(f"{METRIC_PREFIX}_stage_seconds_sum{_format_labels(labels)} {hist[-2]:.6f}")
+            lines.append(f"{METRIC_PREFIX}_stage_seconds_count{_format_labels(labels)} {hist[-1]}")
+        for name in sorted({name for (name, _), _ in counters}):
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+            for (counter_name, label_key), value in counters:
+                if counter_name == name:
+                    lines.append(f"{METRIC_PREFIX}_{name}_total{_format_labels(label_key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # Write-then-rename so a node_exporter textfile collector never reads a partial file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+REGISTRY = MetricsRegistry()
+
+
+class RunTrace:
+    # Everything observed during one user action or one batch item
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+        self.started = time.time()
+        self.wall_seconds = None
+        self._lock = threading.Lock()
+        self.stages = {} # stage -> {"seconds": total, "calls": n}
+        self.counters = {}
+
+    def add_span(self, stage, seconds):
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"seconds": 0.0, "calls": 0})
+            entry["seconds"] += seconds
+            entry["calls"] += 1
+
+    def add_count(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def breakdown(self):
+        # Rows for display, slowest stage first. Stage seconds are summed across worker
+        # threads, so with concurrency they can add up to more than the wall time.
+        with self._lock:
+            rows = [{"stage": stage, "seconds": round(v["seconds"], 3), "calls": v["calls"]}
+                    for stage, v in self.stages.items()]
+        return sorted(rows, key=lambda row: row["seconds"], reverse=True)
+
+    def to_record(self):
+        return {
+            "run": self.name,
+            "labels": self.labels,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.started)),
+            "wall_s": round(self.wall_seconds, 3) if self.wall_seconds is not None else None,
+            "stages": {row["stage"]: {"seconds": row["seconds"], "calls": row["calls"]} for row in self.breakdown()},
+            "counters": dict(self.counters),
+        }
+
+
+@contextmanager
+def trace_run(name, **labels):
+    trace = RunTrace(name, **labels)
+    token = _current_trace.set(trace)
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace.wall_seconds = time.perf_counter() - start
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(stage, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        REGISTRY.observe(stage, seconds, labels)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span(stage, seconds)
+
+
+def count(name, value=1, **labels):
+    REGISTRY.inc(name, value, labels)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_count(name, value)
+
+
+def submit_in_context(pool, fn, *args, **kwargs):
+    # ThreadPoolExecutor does not carry contextvars into workers; this keeps spans in the caller's run
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def append_json_log(path, record):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
@@ -0,0 +1,226 @@
+"""Fetch and analysis pipeline shared by the Streamlit optimizer and the batch CLI.
+
+Nothing in here touches Streamlit: callers pass in the HTTP session, response
+cache and Gemini client they want to use, and errors are raised rather than
+rendered. The UI wraps these functions with widgets and ``st.error``;
+``batch_audit.py`` wraps them with a worker pool and JSONL output.
+"""
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from change_tracking import (MAX_CHANGED_FRACTION, MAX_PARTIAL_UPDATES, build_update_prompt,
+                             conditional_headers, content_hash, diff_sections)
+from chunking import (CHUNK_CONTENT_TEMPLATE, build_reduce_prompt, content_token_budget,
+                      estimate_tokens, split_into_chunks)
+from extraction import charset_from_content_type, extract_structured_text
+from llm_cache import make_cache_key
+from metrics import count, span, submit_in_context
+
+FETCH_TIMEOUT = 10
+MAX_PARALLEL_CHUNKS = 4 # Concurrent Gemini calls per long page when map-reducing sections
+
+# Available models - you might want to fetch this dynamically if you have many or they change often
+# For now, providing common ones. The SDK uses 'models/gemini-1.0-pro', but 'gemini-1.0-pro' often works.
+# The cURL example used 'gemini-2.0-flash'. The current SDK equivalent for "flash" is 'gemini-1.5-flash-latest'.
+# Always check `genai.list_models()` for the exact names if you encounter issues.
+AVAILABLE_MODELS = {
+    "Gemini 1.0 Pro (General Purpose)": "gemini-1.0-pro",
+    "Gemini 1.5 Flash (Fast & Efficient)": "gemini-1.5-flash-latest",
+    # Add other models as needed, e.g., "gemini-1.5-pro-latest"
+}
+# Input-window size per model, used to decide when a page must be chunked
+MODEL_INPUT_TOKEN_LIMITS = {
+    "gemini-1.0-pro": 30720,
+    "gemini-1.5-flash-latest": 1048576,
+}
+DEFAULT_INPUT_TOKEN_LIMIT = 30720 # Conservative default for models not listed above
+
+
+def fetch_content(url, session, extractor=extract_structured_text, timeout=FETCH_TIMEOUT, page_store=None):
+    # With a page_store the request is conditional and a 304 returns the stored text
+    snapshot = page_store.get_page(url) if page_store is not None else None
+    headers = conditional_headers(snapshot, extractor.__name__)
+    with span("fetch"):
+        response = session.get(url, timeout=timeout, headers=headers)
+        if response.status_code == 304 and headers:
+            count("not_modified_responses")
+            return snapshot.text
+        response.raise_for_status()
+    with span("parse"):
+        charset = charset_from_content_type(response.headers.get("Content-Type"))
+        text = extractor(response.content, charset)
+    if page_store is not None:
+        page_store.save_page(url, text, extractor.__name__,
+                             response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return text
+
+
+def request_token_limit(model_name, max_request_tokens=None):
+    # Smaller of the model's input window and an optional per-request cap
+    model_limit = MODEL_INPUT_TOKEN_LIMITS.get(model_name, DEFAULT_INPUT_TOKEN_LIMIT)
+    return min(model_limit, max_request_tokens or model_limit)
+
+
+def generate_analysis(full_prompt, model_name, cache, client, generation_config=None, on_chunk=None):
+    # Runs on worker threads for "Analyze all" and the batch CLI.
+    # Returns (text, from_cache, timing) and lets exceptions propagate to the caller.
+    # With on_chunk set, the response is streamed and on_chunk gets the text received so far.
+    # Timings include any time spent waiting on the shared rate limiter.
+    start = time.perf_counter()
+    with span("cache_lookup"):
+        cache_key = make_cache_key(model_name, full_prompt, generation_config)
+        cached = cache.get(cache_key)
+    if cached is not None:
+        count("cache_hits", model=model_name)
+        elapsed = time.perf_counter() - start
+        return cached, True, {"ttft": elapsed, "total": elapsed}
+    count("cache_misses", model=model_name)
+    first_chunk_at = []
+    def record_chunk(partial):
+        if not first_chunk_at:
+            first_chunk_at.append(time.perf_counter())
+        on_chunk(partial)
+    text = client.generate(model_name, full_prompt, generation_config, on_chunk=record_chunk if on_chunk else None)
+    total = time.perf_counter() - start
+    # Without streaming nothing is visible before the full response
+    ttft = first_chunk_at[0] - start if first_chunk_at else total
+    # Token counts are local estimates: counting exactly would cost another API round trip per call
+    count("prompt_tokens", estimate_tokens(full_prompt), model=model_name)
+    count("response_tokens", estimate_tokens(text), model=model_name)
+    cache.set(cache_key, model_name, text)
+    return text, False, {"ttft": ttft, "total": total}
+
+
+def exact_token_count(full_prompt, model_name, cache, client):
+    # The API's count for a prompt, kept in the response cache next to the responses it decides the chunking
+    # of: a fully cached re-run neither makes the call nor depends on it succeeding. Errors propagate.
+    cache_key = make_cache_key(model_name, full_prompt, {"count_tokens": True}) if cache is not None else None
+    cached = cache.get(cache_key) if cache is not None else None
+    if cached is not None:
+        return int(cached)
+    tokens = client.count_tokens(model_name, full_prompt)
+    if cache is not None:
+        cache.set(cache_key, model_name, str(tokens))
+    return tokens
+
+
+def budget_token_count(full_prompt, model_name, request_token_limit, client, cache=None):
+    # Cheap local estimate first; only ask the API for an exact count when it is close to mattering.
+    # Returns (token count, whether it is exact); a failed count falls back to the estimate.
+    estimate = estimate_tokens(full_prompt)
+    if estimate < request_token_limit * 0.5 or estimate > request_token_limit * 2:
+        return estimate, False
+    try:
+        return exact_token_count(full_prompt, model_name, cache, client), True
+    except Exception:
+        return estimate, False
+
+
+def exceeds_token_budget(full_prompt, model_name, request_token_limit, client, cache=None):
+    return budget_token_count(full_prompt, model_name, request_token_limit, client, cache)[0] > request_token_limit
+
+
+def run_analysis(prompt_template, user_content, criterion_name, model_name, cache, client,
+                 generation_config=None, on_chunk=None, request_token_limit=None):
+    # Like generate_analysis, but pages whose prompt is over the token budget are split on
+    # section boundaries, analyzed concurrently (map) and merged by one more call (reduce).
+    # Each section prompt is cached on its own, so editing one section only re-runs that one.
+    # Returns (text, from_cache, timing, section_count).
+    with span("prompt_build"):
+        full_prompt = prompt_template.format(user_content=user_content)
+        over_budget = False
+        if request_token_limit:
+            prompt_tokens, exact = budget_token_count(full_prompt, model_name, request_token_limit, client, cache)
+            over_budget = prompt_tokens > request_token_limit
+    if not over_budget:
+        text, from_cache, timing = generate_analysis(full_prompt, model_name, cache, client, generation_config, on_chunk)
+        return text, from_cache, timing, 1
+
+    start = time.perf_counter()
+    with span("prompt_build"):
+        # Chunk with the counter that made the budget decision: the local estimate is scaled by how far off
+        # it was for this page (code, URLs and tables tokenize denser than prose), measured exactly once.
+        # The scale is rounded up to steps of 2**0.25 so a small edit does not move every chunk boundary.
+        # Without an exact count the page is not chunked at all: the unscaled estimate would produce
+        # over-budget sections and different cache keys than the run that measured it.
+        if not exact:
+            prompt_tokens = exact_token_count(full_prompt, model_name, cache, client)
+        density = 2 ** (math.ceil(4 * math.log2(max(prompt_tokens / estimate_tokens(full_prompt), 1.0))) / 4)
+        chunks = split_into_chunks(user_content, content_token_budget(request_token_limit),
+                                   lambda text: math.ceil(estimate_tokens(text) * density))
+    if len(chunks) == 1:
+        # Over budget only because of the prompt around the content: a reduce call would have nothing to merge
+        text, from_cache, timing = generate_analysis(full_prompt, model_name, cache, client, generation_config, on_chunk)
+        return text, from_cache, timing, 1
+    with span("prompt_build"):
+        chunk_prompts = [prompt_template.format(user_content=CHUNK_CONTENT_TEMPLATE.format(chunk=chunk)) for chunk in chunks]
+    count("chunked_analyses", model=model_name)
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_CHUNKS, len(chunks))) as pool:
+        futures = [submit_in_context(pool, generate_analysis, prompt, model_name, cache, client, generation_config)
+                   for prompt in chunk_prompts]
+        chunk_outputs = [future.result() for future in futures]
+    map_elapsed = time.perf_counter() - start
+
+    with span("prompt_build"):
+        reduce_prompt = build_reduce_prompt(criterion_name, [output[0] for output in chunk_outputs])
+    text, reduce_cached, reduce_timing = generate_analysis(reduce_prompt, model_name, cache, client, generation_config, on_chunk)
+    from_cache = reduce_cached and all(output[1] for output in chunk_outputs)
+    timing = {"ttft": map_elapsed + reduce_timing["ttft"], "total": time.perf_counter() - start}
+    return text, from_cache, timing, len(chunks)
+
+
+def run_incremental_analysis(prompt_template, user_content, criterion_name, model_name, cache, client, page_store, url,
+                             generation_config=None, on_chunk=None, request_token_limit=None):
+    # Like run_analysis, but remembers the result per (url, criterion, model) in page_store:
+    # unchanged content reuses the stored analysis without a model call, and content with a few
+    # changed sections sends only those sections plus the previous analysis to be revised.
+    # Returns (text, from_cache, timing, section_count, change) with change one of
+    # "unchanged", "sections" or "full".
+    start = time.perf_counter()
+    with span("change_detection"):
+        # The prompt template and settings are part of the key: editing a criterion invalidates old results
+        prompt_key = make_cache_key(model_name, prompt_template, generation_config)
+        previous = page_store.get_analysis(url, criterion_name, model_name)
+        if previous and previous["prompt_key"] != prompt_key:
+            previous = None
+        unchanged = previous is not None and previous["content_hash"] == content_hash(user_content)
+    if unchanged:
+        count("pages_unchanged", model=model_name)
+        elapsed = time.perf_counter() - start
+        return previous["result"], True, {"ttft": elapsed, "total": elapsed}, 0, "unchanged"
+
+    diff = None
+    if previous:
+        with span("change_detection"):
+            diff = diff_sections(previous["sections"], user_content)
+        if not diff.changed and not diff.removed:
+            # Sections were only reordered or re-spaced: the analysis still holds. The new fingerprints are
+            # saved so the next run matches on the page hash without diffing again.
+            count("pages_unchanged", model=model_name)
+            page_store.save_analysis(url, criterion_name, model_name, prompt_key, user_content, previous["result"],
+                                     previous["partial_updates"])
+            elapsed = time.perf_counter() - start
+            return previous["result"], True, {"ttft": elapsed, "total": elapsed}, 0, "unchanged"
+
+    update_prompt = None
+    if (diff is not None and previous["partial_updates"] < MAX_PARTIAL_UPDATES
+            and diff.changed_fraction <= MAX_CHANGED_FRACTION):
+        with span("prompt_build"):
+            update_prompt = build_update_prompt(criterion_name, previous["result"], diff)
+            if request_token_limit and exceeds_token_budget(update_prompt, model_name, request_token_limit, client,
+                                                             cache):
+                update_prompt = None
+
+    if update_prompt is not None:
+        count("sections_reanalyzed", len(diff.changed), model=model_name)
+        text, from_cache, timing = generate_analysis(update_prompt, model_name, cache, client, generation_config, on_chunk)
+        section_count, change, partial_updates = len(diff.changed), "sections", previous["partial_updates"] + 1
+    else:
+        count("pages_fully_reanalyzed", model=model_name)
+        text, from_cache, timing, section_count = run_analysis(
+            prompt_template, user_content, criterion_name, model_name, cache, client,
+            generation_config, on_chunk, request_token_limit)
+        change, partial_updates = "full", 0
+    page_store.save_analysis(url, criterion_name, model_name, prompt_key, user_content, text, partial_updates)
+    return text, from_cache, timing, section_count, change
@@ -0,0 +1,305 @@
+"""Local, vectorized pre-scoring of extracted page text.
+
+Measures what can be measured without a model: sentence and paragraph length
+distributions, heading density, question headings that are answered right
+away, lists and tables, outbound citations, bylines and how recent the newest
+date on the page is. Each page's lines are classified in one pass; sentence
+and paragraph lengths for the whole batch are then measured on the raw bytes
+into flat arrays tagged with their page index, and every per-page statistic
+and score is computed for the whole batch at once with NumPy.
+
+The scores fill in the Readiness Checker's checklist and triage pages into
+"ready", "borderline" and "needs_work", so bulk audits only spend Gemini calls
+on the borderline pages.
+"""
+import re
+from datetime import date
+
+import numpy as np
+
+LONG_SENTENCE_WORDS = 25
+LONG_PARAGRAPH_WORDS = 120
+DIRECT_ANSWER_WORDS = 40 # First sentence under a question heading at most this long counts as a direct answer
+WORDS_PER_HEADING = 300 # One heading per this many words counts as fully structured
+THIN_CONTENT_WORDS = 150 # Pages shorter than this are "needs_work" whatever else they score
+FRESH_DAYS = 365
+STALE_DAYS = 730
+TRIAGE_LOW = 0.35 # Scores at or below this are "needs_work"
+TRIAGE_HIGH = 0.75 # Scores at or above this are "ready"
+
+# Relative weight of each sub-score in the overall readiness score
+SIGNAL_WEIGHTS = {
+    "readability": 2.0,
+    "paragraphs": 1.0,
+    "structure": 1.5,
+    "answers": 1.5,
+    "scannability": 1.0,
+    "citations": 1.5,
+    "freshness": 1.0,
+    "authorship": 1.0,
+}
+
+_ORDERED_ITEM_RE = re.compile(r"\d+[.)]\s")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+# Counted with str.count on lowercased text: far faster than one big case-insensitive regex
+_CITATION_PHRASES = ("http://", "https://", "www.", "according to", "source:", "sources:", "cited in", "cited by",
+                     "published in", "published by", "study by", "survey by", "report by", "data from")
+_REFERENCE_MARK_RE = re.compile(r"\[\d{1,3}\]")
+_BYLINE_RE = re.compile(r"^\s*(?:by|written by|reviewed by|author:)\s+[A-Z]", re.MULTILINE | re.IGNORECASE)
+_MONTHS = {name: number for number, names in enumerate(
+    [("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"), ("may",), ("jun", "june"),
+     ("jul", "july"), ("aug", "august"), ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"),
+     ("dec", "december")], start=1) for name in names}
+# Dates are found by their year first (a literal prefix keeps the scan fast), then the text just before
+# it is parsed for a month and day. Only 20xx matters: anything older scores as stale as no date at all.
+_YEAR_RE = re.compile(r"20\d\d(?:-(\d\d)-(\d\d))?")
+_MONTH_DAY_RE = re.compile(r"([A-Za-z]{3,9})\.? (\d{1,2})(?:st|nd|rd|th)?,? $")
+
+_INFORMATIONAL_QUERY_RE = re.compile(
+    r"^(?:how|what|why|when|where|which|who|is|are|can|does|do|should)\b|\b(?:guide|tutorial|explain|"
+    r"explained|meaning|definition|pros and cons|tips|ideas|examples|benefits|difference)\b", re.IGNORECASE)
+_SYNTHESIS_QUERY_RE = re.compile(
+    r"\b(?:vs\.?|versus|compare|comparison|pros and cons|best|alternatives|difference between|"
+    r"advantages|disadvantages|options|ways to|review)\b", re.IGNORECASE)
+_YMYL_QUERY_RE = re.compile(
+    r"\b(?:health|medical|medicine|symptoms?|disease|treatment|drug|dosage|diet|pregnan\w*|mental|"
+    r"finance|financial|invest\w*|loan|mortgage|tax(?:es)?|insurance|retirement|credit|debt|stock|crypto\w*|"
+    r"legal|lawyer|law|lawsuit|visa|immigration|safety|emergency)\b", re.IGNORECASE)
+
+
+def _date_ordinals(text, today_ordinal):
+    ordinals = []
+    for match in _YEAR_RE.finditer(text):
+        start, end = match.span()
+        if (start and text[start - 1].isdigit()) or (end < len(text) and text[end].isdigit()):
+            continue
+        year = match.group()[:4]
+        month, day = match.groups()
+        if month is None:
+            month_day = _MONTH_DAY_RE.search(text, max(0, match.start() - 16), match.start())
+            if month_day is None or month_day.group(1).lower() not in _MONTHS:
+                continue
+            month, day = _MONTHS[month_day.group(1).lower()], month_day.group(2)
+        try:
+            found = date(int(year), int(month), int(day)).toordinal()
+        except ValueError:
+            continue
+        if found <= today_ordinal + 1: # Future dates are events, not publication dates
+            ordinals.append(found)
+    return ordinals
+
+
+def _count_citations(text):
+    lowered = text.lower()
+    return sum(lowered.count(phrase) for phrase in _CITATION_PHRASES) + len(_REFERENCE_MARK_RE.findall(text))
+
+
+def _classify_lines(text):
+    # One pass over the lines: (paragraphs, heading count, question headings, answers, list items, table rows).
+    # An answer is the first paragraph right after a question heading.
+    paragraphs, answers = [], []
+    headings = question_headings = list_items = table_rows = 0
+    after_question = False
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        first = line[0]
+        if first == "#":
+            headings += 1
+            after_question = line.endswith("?")
+            question_headings += after_question
+            continue
+        if first in "-*+" and line[1:2] == " " or first.isdigit() and _ORDERED_ITEM_RE.match(line):
+            list_items += 1
+        elif first == "|":
+            table_rows += 1
+        elif first != ">":
+            paragraphs.append(line)
+            if after_question:
+                answers.append(line)
+        after_question = False
+    return paragraphs, headings, question_headings, answers, list_items, table_rows
+
+
+def _segment_word_counts(paragraph_blocks):
+    # Word counts of every sentence and every paragraph in the batch, computed on the raw bytes:
+    # spaces are word gaps, ". "/"! "/"? " ends a sentence, "\n" ends a paragraph (and a sentence).
+    # Returns (sentence_words, sentence_page, paragraph_words, paragraph_page).
+    encoded = [("\n" + block).encode("utf-8") for block in paragraph_blocks]
+    page_starts = np.cumsum([0] + [len(block) for block in encoded[:-1]])
+    buffer = np.frombuffer(b"".join(encoded) + b"\n", dtype=np.uint8)
+    spaces = np.cumsum(buffer == 32)
+    newlines = np.flatnonzero(buffer == 10)
+    ends = np.flatnonzero((buffer[1:] == 32) & np.isin(buffer[:-1], (33, 46, 63))) + 1
+
+    def counts_between(boundaries):
+        # Segment k spans (boundaries[k], boundaries[k + 1]); its words are the spaces strictly inside, plus one
+        starts, stops = boundaries[:-1], boundaries[1:]
+        keep = stops - starts > 1
+        words = (spaces[stops - 1] - spaces[starts] + 1)[keep].astype(np.float64)
+        return words, np.searchsorted(page_starts, starts[keep], side="right") - 1
+
+    sentence_words, sentence_page = counts_between(np.union1d(newlines, ends))
+    paragraph_words, paragraph_page = counts_between(newlines)
+    return sentence_words, sentence_page, paragraph_words, paragraph_page
+
+
+def _per_page_stats(values, page_index, page_count):
+    # Count, mean and 90th percentile of a flat array grouped by page, without a Python loop over pages
+    counts = np.bincount(page_index, minlength=page_count)
+    sums = np.bincount(page_index, weights=values, minlength=page_count)
+    means = np.divide(sums, counts, out=np.zeros(page_count), where=counts > 0)
+    p90 = np.zeros(page_count)
+    if len(values):
+        ordered = values[np.lexsort((values, page_index))]
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        has_values = counts > 0
+        p90[has_values] = ordered[starts[has_values] + np.floor(0.9 * (counts[has_values] - 1)).astype(np.int64)]
+    return counts, means, p90
+
+
+def _share_above(values, page_index, page_count, threshold, counts):
+    above = np.bincount(page_index, weights=values > threshold, minlength=page_count)
+    return np.divide(above, counts, out=np.zeros(page_count), where=counts > 0)
+
+
+def compute_signals(texts, today=None):
+    # Returns a dict of per-page NumPy arrays (one entry per text)
+    today_ordinal = (today or date.today()).toordinal()
+    page_count = len(texts)
+    paragraph_blocks = []
+    answer_words, answer_page = [], []
+    date_ordinals, date_page = [], []
+    scalars = np.zeros((page_count, 7))
+    for i, text in enumerate(texts):
+        paragraphs, headings, question_headings, answers, list_items, table_rows = _classify_lines(text)
+        paragraph_blocks.append("\n".join(paragraphs))
+        answer_words.extend(_SENTENCE_END_RE.split(answer, 1)[0].count(" ") + 1 for answer in answers)
+        answer_page.extend([i] * len(answers))
+        dates = _date_ordinals(text, today_ordinal)
+        date_ordinals.extend(dates)
+        date_page.extend([i] * len(dates))
+        words = text.count(" ") + text.count("\n") + 1 if text.strip() else 0
+        scalars[i] = (words, headings, question_headings, list_items, table_rows,
+                      _count_citations(text), bool(_BYLINE_RE.search(text)))
+
+    sentence_words, sentence_page, paragraph_words, paragraph_page = _segment_word_counts(paragraph_blocks)
+    sentence_count, sentence_mean, sentence_p90 = _per_page_stats(sentence_words, sentence_page, page_count)
+    paragraph_count, paragraph_mean, paragraph_p90 = _per_page_stats(paragraph_words, paragraph_page, page_count)
+
+    answer_words = np.asarray(answer_words, dtype=np.float64)
+    answer_page = np.asarray(answer_page, dtype=np.int64)
+    direct_answers = np.bincount(answer_page, weights=answer_words <= DIRECT_ANSWER_WORDS, minlength=page_count)
+
+    newest = np.full(page_count, -1, dtype=np.int64)
+    if date_ordinals:
+        np.maximum.at(newest, np.asarray(date_page, dtype=np.int64), np.asarray(date_ordinals, dtype=np.int64))
+    age_days = np.where(newest >= 0, today_ordinal - newest, -1)
+
+    words = scalars[:, 0]
+    return {
+        "words": words.astype(np.int64),
+        "sentences": sentence_count,
+        "sentence_words_mean": sentence_mean,
+        "sentence_words_p90": sentence_p90,
+        "long_sentence_share": _share_above(sentence_words, sentence_page, page_count, LONG_SENTENCE_WORDS, sentence_count),
+        "paragraphs": paragraph_count,
+        "paragraph_words_mean": paragraph_mean,
+        "paragraph_words_p90": paragraph_p90,
+        "long_paragraph_share": _share_above(paragraph_words, paragraph_page, page_count, LONG_PARAGRAPH_WORDS, paragraph_count),
+        "headings": scalars[:, 1].astype(np.int64),
+        "words_per_heading": words / np.maximum(scalars[:, 1], 1),
+        "question_headings": scalars[:, 2].astype(np.int64),
+        "direct_answers": direct_answers.astype(np.int64),
+        "list_items": scalars[:, 3].astype(np.int64),
+        "table_rows": scalars[:, 4].astype(np.int64),
+        "citations": scalars[:, 5].astype(np.int64),
+        "has_byline": scalars[:, 6].astype(bool),
+        "newest_date_age_days": age_days,
+    }
+
+
+def sub_scores(signals):
+    # Each signal mapped onto 0..1, where 1 is what summarizers handle best
+    words = signals["words"].astype(np.float64)
+    age = signals["newest_date_age_days"]
+    return {
+        "readability": 1 - np.clip((signals["sentence_words_mean"] - 20) / 15, 0, 1) * 0.7
+                       - np.clip(signals["long_sentence_share"] / 0.5, 0, 1) * 0.3,
+        "paragraphs": 1 - np.clip(signals["long_paragraph_share"] / 0.5, 0, 1),
+        "structure": np.clip(signals["headings"] * WORDS_PER_HEADING / np.maximum(words, 1), 0, 1),
+        "answers": np.clip(signals["direct_answers"] / 2, 0, 1),
+        "scannability": ((signals["list_items"] > 0) | (signals["table_rows"] > 0)).astype(np.float64),
+        "citations": np.clip(signals["citations"] / 3, 0, 1),
+        "freshness": np.select([age < 0, age <= FRESH_DAYS, age <= STALE_DAYS], [0.0, 1.0, 0.5], 0.0),
+        "authorship": signals["has_byline"].astype(np.float64),
+    }
+
+
+def readiness_scores(signals):
+    scores = sub_scores(signals)
+    weights = np.array([SIGNAL_WEIGHTS[name] for name in scores])
+    stacked = np.vstack([scores[name] for name in scores])
+    return weights @ stacked / weights.sum()
+
+
+def triage(signals, scores=None, low=TRIAGE_LOW, high=TRIAGE_HIGH):
+    # "ready" and "needs_work" pages are clear-cut; only "borderline" ones need a model's opinion
+    scores = readiness_scores(signals) if scores is None else scores
+    labels = np.where(scores >= high, "ready", np.where(scores <= low, "needs_work", "borderline"))
+    return np.where(signals["words"] < THIN_CONTENT_WORDS, "needs_work", labels)
+
+
+def query_relevance(query, texts):
+    # Share of the query's words (3+ letters) that appear in each text
+    terms = {term for term in re.findall(r"[a-z0-9]{3,}", query.lower())}
+    if not terms:
+        return np.zeros(len(texts))
+    return np.array([sum(term in text.lower() for term in terms) / len(terms) for text in texts])
+
+
+def page_signals(signals, index):
+    # One page's signals as plain Python values, for tables and JSON output
+    return {name: values[index].item() for name, values in signals.items()}
+
+
+def suggest_checks(query, text, today=None):
+    # Readiness Checker answers that can be measured locally, keyed by the checklist's question text.
+    # Questions that need outside knowledge (source availability, niche topics, policy) are left out.
+    signals = compute_signals([text], today=today)
+    scores = {name: values[0] for name, values in sub_scores(signals).items()}
+    citations = signals["citations"][0]
+    strong_eeat = bool(signals["has_byline"][0] and citations >= 2)
+    is_ymyl = bool(_YMYL_QUERY_RE.search(query))
+    checks_when = {
+        "Is it primarily an informational query (how-to, what-is, pros/cons)?": bool(_INFORMATIONAL_QUERY_RE.search(query.strip())),
+        "Does it potentially require synthesizing info from multiple sources?": bool(_SYNTHESIS_QUERY_RE.search(query))
+                                                                               or len(query.split()) >= 5,
+        "If YMYL, is the information exceptionally high E-E-A-T and corroborated?": not is_ymyl
+                                                                                   or (strong_eeat and citations >= 4),
+    }
+    checks_content = {
+        "Is your content directly relevant to this query/topic?": bool(query_relevance(query, [text])[0] >= 0.6),
+        "Does your content demonstrate strong E-E-A-T?": strong_eeat,
+        "Is the information in your content likely corroborated by other reputable sources?": bool(citations >= 2),
+        "Is your content up-to-date (if timeliness is important for this topic)?": bool(scores["freshness"] >= 1.0),
+        "Is your content clear, concise, and well-structured for easy summarization?": bool(
+            scores["readability"] >= 0.6 and scores["structure"] >= 0.5 and scores["paragraphs"] >= 0.5),
+    }
+    return checks_when, checks_content, signals
+
+
+def local_report(signals, index, score, label):
+    # Markdown summary recorded instead of a Gemini analysis for pages triaged as clear-cut
+    s = page_signals(signals, index)
+    age = f"{s['newest_date_age_days']} days old" if s["newest_date_age_days"] >= 0 else "no date found"
+    return (f"**Local pre-score: {score:.2f} ({label.replace('_', ' ')})**\n\n"
+            f"- {s['words']} words, {s['headings']} headings (one per {s['words_per_heading']:.0f} words)\n"
+            f"- Sentences: {s['sentence_words_mean']:.1f} words on average, "
+            f"{s['long_sentence_share']:.0%} over {LONG_SENTENCE_WORDS} words\n"
+            f"- Paragraphs: {s['paragraph_words_mean']:.0f} words on average, "
+            f"{s['long_paragraph_share']:.0%} over {LONG_PARAGRAPH_WORDS} words\n"
+            f"- {s['question_headings']} question headings, {s['direct_answers']} answered directly\n"
+            f"- {s['list_items']} list items, {s['table_rows']} table rows\n"
+            f"- {s['citations']} citations, byline {'found' if s['has_byline'] else 'missing'}, newest date {age}\n")
@@ -0,0 +1,206 @@
+"""Persistent history of audit results, for dashboards and score trends.
+
+Every finished analysis (app or batch CLI) becomes one row in a single SQLite
+table with indexes on URL, domain, criterion, model and time. The database
+runs in WAL mode, so the dashboard can read while audits are being written.
+Writers never touch the database directly: rows go onto a queue that one
+writer thread commits in batches, so concurrent batch workers never wait on
+the SQLite write lock and a batch of rows costs one commit instead of one each.
+
+Reads are built for large histories. Listings page with a keyset cursor on
+(analyzed_at, id), so page 500 costs the same as page 1, and listing queries
+never read the stored report text. Trends are aggregated per day in SQL, one
+URL at a time. Each row's ``score`` is the local readiness pre-score
+(prescoring.py) of the analyzed text, so it is comparable across criteria and
+models.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit
+
+DEFAULT_RESULTS_PATH = os.path.join(".burst_seo_cache", "audit_results.sqlite3")
+WRITE_BATCH_SIZE = 200 # Rows committed per transaction at most
+FLUSH_INTERVAL_SECONDS = 0.5 # Longest a queued row waits before it is committed
+MAX_FILTER_VALUES = 1000 # Distinct values offered per dashboard filter
+
+_FILTER_COLUMNS = ("domain", "criterion", "model_name", "status", "analyzed_by")
+_LISTING_COLUMNS = ("id", "analyzed_at", "url", "domain", "criterion", "model_name", "status",
+                    "score", "analyzed_by", "from_cache", "change")
+_STOP = object()
+
+
+def url_domain(url):
+    if not url:
+        return None
+    return (urlsplit(url).hostname or "").lower() or None
+
+
+def _where(filters):
+    # Equality filters plus a URL prefix, written as a range so it can use the url index
+    clauses, params = [], []
+    for column in _FILTER_COLUMNS:
+        if filters.get(column):
+            clauses.append(f"{column} = ?")
+            params.append(filters[column])
+    if filters.get("url_prefix"):
+        clauses.append("url >= ? AND url < ?")
+        params += [filters["url_prefix"], filters["url_prefix"] + "\U0010ffff"]
+    if filters.get("since") is not None:
+        clauses.append("analyzed_at >= ?")
+        params.append(filters["since"])
+    if filters.get("until") is not None:
+        clauses.append("analyzed_at < ?")
+        params.append(filters["until"])
+    return clauses, params
+
+
+class ResultsStore:
+    def __init__(self, path=DEFAULT_RESULTS_PATH, batch_size=WRITE_BATCH_SIZE, flush_interval=FLUSH_INTERVAL_SECONDS):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # The writer connection belongs to the writer thread; reads share a second one, serialized by self._lock
+        self._write_conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._write_conn.execute("PRAGMA journal_mode=WAL")
+        self._write_conn.execute("PRAGMA synchronous=NORMAL") # Durable at each checkpoint, not each commit
+        self._write_conn.execute(
+            "CREATE TABLE IF NOT EXISTS audits ("
+            " id INTEGER PRIMARY KEY,"
+            " analyzed_at REAL NOT NULL,"
+            " url TEXT,"
+            " domain TEXT,"
+            " criterion TEXT NOT NULL,"
+            " model_name TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " score REAL,"
+            " analyzed_by TEXT,"
+            " from_cache INTEGER,"
+            " change TEXT,"
+            " result BLOB NOT NULL)"
+        )
+        # (column, analyzed_at) pairs serve both the filter and the newest-first order without a sort
+        for column in ("url", "domain", "criterion", "model_name"):
+            self._write_conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_audits_{column} ON audits({column}, analyzed_at)")
+        self._write_conn.execute("CREATE INDEX IF NOT EXISTS idx_audits_analyzed_at ON audits(analyzed_at)")
+        self._write_conn.commit()
+        self._read_conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="results-writer", daemon=True)
+        self._writer.start()
+
+    def add(self, url, criterion, model_name, result, status="ok", score=None, analyzed_by="gemini",
+            from_cache=None, change=None, analyzed_at=None):
+        # Queues the row and returns immediately; it is committed within flush_interval
+        self._queue.put((
+            analyzed_at or time.time(), url or None, url_domain(url), criterion, model_name, status,
+            None if score is None else float(score), analyzed_by,
+            None if from_cache is None else int(from_cache), change, zlib.compress((result or "").encode("utf-8")),
+        ))
+
+    def _write_loop(self):
+        stopping = False
+        while not stopping:
+            rows = []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                rows.append(item)
+                if len(rows) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+            if rows:
+                try:
+                    self._write_conn.executemany(
+                        "INSERT INTO audits (analyzed_at, url, domain, criterion, model_name, status, score,"
+                        " analyzed_by, from_cache, change, result) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                    self._write_conn.commit()
+                    self.written += len(rows)
+                except sqlite3.Error:
+                    # History is best-effort: a locked or full disk must not stall the audits feeding it
+                    self._write_conn.rollback()
+                    self.dropped += len(rows)
+            for _ in range(len(rows) + stopping):
+                self._queue.task_done()
+
+    def flush(self):
+        # Blocks until every queued row is committed
+        self._queue.join()
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        self._write_conn.close()
+        with self._lock:
+            self._read_conn.close()
+
+    def count(self, **filters):
+        clauses, params = _where(filters)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            return self._read_conn.execute(f"SELECT COUNT(*) FROM audits{where}", params).fetchone()[0]
+
+    def page(self, limit=50, before=None, **filters):
+        # Newest first. `before` is the cursor returned with the previous page; None starts at the newest row.
+        # Returns (rows, cursor for the next page or None when this was the last one).
+        clauses, params = _where(filters)
+        if before is not None:
+            clauses.append("(analyzed_at, id) < (?, ?)")
+            params += list(before)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._read_conn.execute(
+                f"SELECT {', '.join(_LISTING_COLUMNS)} FROM audits{where}"
+                " ORDER BY analyzed_at DESC, id DESC LIMIT ?", params + [limit + 1]).fetchall()
+        cursor = (rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+        return [dict(zip(_LISTING_COLUMNS, row)) for row in rows[:limit]], cursor
+
+    def get(self, audit_id):
+        with self._lock:
+            row = self._read_conn.execute(
+                f"SELECT {', '.join(_LISTING_COLUMNS)}, result FROM audits WHERE id = ?", (audit_id,)).fetchone()
+        if row is None:
+            return None
+        record = dict(zip(_LISTING_COLUMNS, row[:-1]))
+        record["result"] = zlib.decompress(row[-1]).decode("utf-8")
+        return record
+
+    def score_trend(self, url, criterion=None, model_name=None):
+        # Daily average score and audit count for one URL, oldest first
+        clauses, params = _where({"criterion": criterion, "model_name": model_name})
+        extra = "".join(f" AND {clause}" for clause in clauses)
+        with self._lock:
+            rows = self._read_conn.execute(
+                "SELECT date(analyzed_at, 'unixepoch') AS day, AVG(score), COUNT(*) FROM audits"
+                f" WHERE url = ? AND status = 'ok'{extra} GROUP BY day ORDER BY day",
+                [url] + params).fetchall()
+        return [{"day": day, "score": score, "audits": audits} for day, score, audits in rows]
+
+    def distinct(self, column):
+        # Filter options for the dashboard
+        if column not in _FILTER_COLUMNS:
+            raise ValueError(f"Not a filterable column: {column}")
+        with self._lock:
+            rows = self._read_conn.execute(
+                f"SELECT DISTINCT {column} FROM audits WHERE {column} IS NOT NULL ORDER BY {column} LIMIT ?",
+                (MAX_FILTER_VALUES,)).fetchall()
+        return [value for value, in rows]
+
+    def __len__(self):
+        return self.count()
@@ -0,0 +1,18 @@
+import pytest
+
+
+class DictCache:
+    # In-memory stand-in for llm_cache.ResponseCache
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, model_name, response):
+        self.entries[key] = response
+
+
+@pytest.fixture
+def cache():
+    return DictCache()
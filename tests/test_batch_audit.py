@@ -0,0 +1,110 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from batch_audit import BatchAuditor, run_batch
+from dedupe import NearDuplicateIndex
+
+CRITERIA = {"Clarity": {"prompt": "Review this page for clarity.\n---\n{user_content}\n---\n"}}
+
+
+def page(topic):
+    return " ".join(f"{topic} guide step {n} explains how to brew and serve {topic} at home." for n in range(40))
+
+
+class GatedClient:
+    # Calls about `gated_topic` block until the test opens the gate
+    def __init__(self, gated_topic):
+        self.gated_topic = gated_topic
+        self.gate = threading.Event()
+
+    def count_tokens(self, model_name, prompt):
+        return len(prompt) // 4
+
+    def generate(self, model_name, prompt, generation_config=None, on_chunk=None):
+        if self.gated_topic in prompt:
+            assert self.gate.wait(10)
+        return "report " + prompt.split()[7]
+
+
+def test_duplicates_do_not_hold_workers_while_their_representative_runs(cache):
+    client = GatedClient("espresso")
+    auditor = BatchAuditor(client, cache, None, "gemini-1.5-flash-latest", CRITERIA,
+                           dedupe_index=NearDuplicateIndex())
+    items = [{"id": f"espresso-{n}", "url": "", "text": page("espresso")} for n in range(6)]
+    items.append({"id": "matcha", "url": "", "text": page("matcha")})
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [auditor.submit(pool, item, list(CRITERIA))[0] for item in items]
+        # The espresso representative is stuck on the model and its five duplicates are parked on it,
+        # so the second worker is still free for the next cluster
+        matcha = futures[-1].result(timeout=5)
+        assert matcha[0]["status"] == "ok" and "duplicate_of" not in matcha[0]
+        assert not any(future.done() for future in futures[:-1])
+        client.gate.set()
+        espresso = [future.result(timeout=5)[0] for future in futures[:-1]]
+    assert espresso[0]["status"] == "ok" and "duplicate_of" not in espresso[0]
+    assert all(record["duplicate_of"] == "espresso-0" and record["result"] == espresso[0]["result"]
+               for record in espresso[1:])
+
+
+class ListWriter:
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+
+def test_parked_duplicates_do_not_fill_the_run_batch_window(cache):
+    client = GatedClient("espresso")
+    auditor = BatchAuditor(client, cache, None, "gemini-1.5-flash-latest", CRITERIA, dedupe_index=NearDuplicateIndex())
+    items = [{"id": f"espresso-{n}", "url": "", "text": page("espresso")} for n in range(6)]
+    items += [{"id": topic, "url": "", "text": page(topic)} for topic in ("matcha", "rooibos", "chai", "oolong")]
+    writer = ListWriter()
+    # The window is 4 items; five espresso duplicates would fill it if parked items still counted
+    batch = threading.Thread(target=run_batch, args=(items, auditor, writer, set(), 2))
+    batch.start()
+    deadline = time.monotonic() + 5
+    while len(writer.records) < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sorted(record["id"] for record in writer.records) == ["chai", "matcha", "oolong", "rooibos"]
+    client.gate.set()
+    batch.join(5)
+    assert len(writer.records) == len(items)
+
+
+class FailingClient(GatedClient):
+    # The gated representative fails; every other call takes `delay` seconds
+    def __init__(self, gated_topic, delay):
+        super().__init__(gated_topic)
+        self.delay = delay
+        self.started = threading.Event()
+
+    def generate(self, model_name, prompt, generation_config=None, on_chunk=None):
+        if self.gated_topic in prompt and "variant" not in prompt:
+            self.started.set()
+            assert self.gate.wait(10)
+            raise RuntimeError("quota exceeded")
+        time.sleep(self.delay)
+        return "report"
+
+
+def test_duplicates_of_a_failed_representative_are_analyzed_on_the_pool(cache):
+    client = FailingClient("espresso", delay=0.5)
+    auditor = BatchAuditor(client, cache, None, "gemini-1.5-flash-latest", CRITERIA, dedupe_index=NearDuplicateIndex())
+    base = page("espresso")
+    # Distinct texts (no shared cache entries) that are still near-duplicates of the representative
+    items = [{"id": "espresso-0", "url": "", "text": base}]
+    items += [{"id": f"espresso-{n}", "url": "", "text": base + f" variant {n}"} for n in range(1, 6)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [auditor.submit(pool, items[0], list(CRITERIA))]
+        assert client.started.wait(5) # Registered as the representative before any duplicate arrives
+        futures += [auditor.submit(pool, item, list(CRITERIA)) for item in items[1:]]
+        assert all(released.result(timeout=5) for _, released in futures[1:])
+        start = time.perf_counter()
+        client.gate.set()
+        records = [future.result(timeout=10)[0] for future, _ in futures]
+        elapsed = time.perf_counter() - start
+    assert records[0]["status"] == "error"
+    assert all(record["status"] == "ok" and "duplicate_of" not in record for record in records[1:])
+    assert elapsed < 1.5 # Five 0.5s analyses side by side, not one after another on the failing worker
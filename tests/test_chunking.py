@@ -0,0 +1,52 @@
+import random
+
+from chunking import estimate_tokens, split_into_chunks, split_sections
+
+WORDS = "the of coffee brew water beans grind roast steep cold hot time minutes filter milk sugar flavour".split()
+
+
+def random_page(rng, sections=30):
+    def paragraph():
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 200))) + "."
+    return [f"## Section {n}\n" + "\n".join(paragraph() for _ in range(rng.randint(1, 6))) for n in range(sections)], paragraph
+
+
+def test_editing_one_section_leaves_the_other_chunks_byte_identical():
+    rng = random.Random(7)
+    kept = total = 0
+    for _ in range(50):
+        sections, paragraph = random_page(rng)
+        before = split_into_chunks("\n".join(sections), 1500)
+        sections[2] += "\n" + paragraph() + " " + paragraph() # Grow an early section
+        after = set(split_into_chunks("\n".join(sections), 1500))
+        changed = [chunk for chunk in before if chunk not in after]
+        assert len(changed) <= 2 # The chunk holding the edit, at most one more after a forced early cut
+        assert not after.issubset(before)
+        kept += len(before) - len(changed)
+        total += len(before)
+    assert kept / total > 0.9
+
+
+def test_chunks_respect_the_budget_and_keep_every_section():
+    rng = random.Random(3)
+    sections, _ = random_page(rng, sections=40)
+    text = "\n".join(sections)
+    chunks = split_into_chunks(text, 1200)
+    assert all(estimate_tokens(chunk) <= 1200 for chunk in chunks)
+    assert "\n".join(chunks) == text
+    assert split_sections("\n".join(chunks)) == sections
+
+
+def test_oversized_section_is_split_on_its_own():
+    rng = random.Random(5)
+    sections, paragraph = random_page(rng, sections=6)
+    sections[3] = "## Huge\n" + "\n".join(paragraph() for _ in range(60))
+    chunks = split_into_chunks("\n".join(sections), 1000)
+    huge = [chunk for chunk in chunks if chunk.startswith("## Huge") or chunk in sections[3]]
+    assert len(huge) > 1
+    assert all(estimate_tokens(chunk) <= 1000 for chunk in chunks)
+
+
+def test_non_ascii_text_is_not_underestimated():
+    assert estimate_tokens("コーヒーの淹れ方" * 100) >= 800
+    assert estimate_tokens("x" * 4000) == 1001
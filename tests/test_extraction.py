@@ -0,0 +1,73 @@
+import glob
+import os
+
+import pytest
+
+import extraction
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures")
+FIXTURES = sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html")))
+BACKENDS = [extraction._extract_bs4] + ([extraction._extract_lxml] if extraction.lxml is not None else [])
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=os.path.basename)
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.__name__)
+def test_every_fixture_keeps_its_content(path, backend):
+    with open(path, "rb") as f:
+        html = f.read()
+    text = backend(html)
+    assert text.startswith("# ")
+    assert len(text) > len(extraction.extract_paragraph_text(html)) / 2
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.__name__)
+@pytest.mark.parametrize("name, kept, dropped", [
+    ("aspnet_webforms.html", "Cold brew coffee is made by steeping", "Sign up for our newsletter"),
+    ("wordpress_tagged_post.html", "Social proof is the tendency", "Great article, thanks for sharing"),
+    ("main_with_sidebar.html", "How to Choose a Standing Desk", "We use cookies"),
+    ("site_wrapper_menu_closed.html", "Repot a monstera every one to two years", "You might also like"),
+])
+def test_boilerplate_heuristic_spares_content_wrappers(backend, name, kept, dropped):
+    text = backend(read_fixture(name))
+    assert kept in text
+    assert dropped not in text
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.__name__)
+def test_class_tokens_match_whole_words_only(backend):
+    html = (b'<html><body><div class="tag-social-media"><p>Kept paragraph.</p></div>'
+            b'<div class="social"><p>Dropped paragraph.</p></div></body></html>')
+    assert backend(html) == "Kept paragraph."
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.__name__)
+def test_utf8_page_without_meta_charset_is_not_read_as_latin1(backend):
+    text = backend(read_fixture("utf8_no_meta_charset.html"))
+    assert "# Café Culture in Lisbon — A Short Guide" in text
+    assert "the “bica”" in text
+    assert "Ã" not in text
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.__name__)
+@pytest.mark.parametrize("html, encoding", [
+    ("<p>Café “quoted” — dash</p>".encode("cp1252"), None), # Not valid UTF-8: browsers' Windows-1252 fallback
+    ("<p>Café “quoted” — dash</p>".encode("cp1252"), "iso-8859-1"), # Latin-1 labels mean Windows-1252
+    ('<meta charset="windows-1252"><p>Café “quoted” — dash</p>'.encode("cp1252"), None),
+    ('<meta charset="iso-8859-1"><p>Café “quoted” — dash</p>'.encode("utf-8"), "utf-8"), # HTTP header wins
+    ("﻿<p>Café “quoted” — dash</p>".encode("utf-8"), "iso-8859-1"), # And a byte order mark beats both
+])
+def test_encoding_precedence(backend, html, encoding):
+    assert backend(html, encoding) == "Café “quoted” — dash"
+
+
+def test_charset_from_content_type():
+    assert extraction.charset_from_content_type("text/html; charset=UTF-8") == "utf-8"
+    assert extraction.charset_from_content_type('text/html; charset="Shift_JIS"') == "shift_jis"
+    assert extraction.charset_from_content_type("text/html") is None
+    assert extraction.charset_from_content_type("text/html; charset=nonsense") is None
+    assert extraction.charset_from_content_type(None) is None
@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+import pytest
+
+from gemini_client import GeminiClient
+
+
+class QuotaError(Exception):
+    code = 429
+
+
+class FlakyModel:
+    # count_tokens fails with a retryable quota error `failures` times, then answers
+    def __init__(self, failures):
+        self.failures = failures
+        self.attempts = 0
+
+    def count_tokens(self, prompt):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise QuotaError("quota exceeded")
+        return SimpleNamespace(total_tokens=42)
+
+
+def test_count_tokens_is_paced_and_retried():
+    model = FlakyModel(failures=2)
+    client = GeminiClient(backoff_base=0.001, model_factory=lambda name: model)
+    acquired = []
+    acquire = client.limiter.acquire
+    client.limiter.acquire = lambda token_count: acquired.append(token_count) or acquire(token_count)
+    assert client.count_tokens("gemini-1.0-pro", "prompt") == 42
+    assert (model.attempts, client.retries) == (3, 2)
+    assert acquired == [0, 0, 0] # One request per attempt, no token quota
+
+
+def test_count_tokens_gives_up_after_max_retries():
+    client = GeminiClient(max_retries=1, backoff_base=0.001, model_factory=lambda name: FlakyModel(failures=5))
+    with pytest.raises(QuotaError):
+        client.count_tokens("gemini-1.0-pro", "prompt")
@@ -0,0 +1,111 @@
+import pytest
+
+from change_tracking import PageStateStore, content_hash
+from chunking import CHARS_PER_TOKEN
+from optimizer_core import request_token_limit, run_analysis, run_incremental_analysis
+
+MODEL = "gemini-1.0-pro"
+PROMPT_TEMPLATE = "Review this page for clarity.\n---\n{user_content}\n---\n"
+
+
+class DenseTokenClient:
+    # Stands in for Gemini on token-dense text (code, URLs): one token per `chars_per_token` characters
+    def __init__(self, chars_per_token=1.5):
+        self.chars_per_token = chars_per_token
+        self.prompts = []
+        self.counted = 0
+        self.count_error = None # Raised by count_tokens when set
+
+    def count_tokens(self, model_name, prompt):
+        self.counted += 1
+        if self.count_error is not None:
+            raise self.count_error
+        return int(len(prompt) / self.chars_per_token) + 1
+
+    def generate(self, model_name, prompt, generation_config=None, on_chunk=None):
+        self.prompts.append(prompt)
+        return f"findings {len(self.prompts)}"
+
+
+def url_page(sections, lines_per_section):
+    return "\n".join(
+        f"## Endpoints {n}\n" + "\n".join(f"https://api.example.com/v2/resource_{n}_{i}?id={i * 7919}&fmt=json"
+                                          for i in range(lines_per_section))
+        for n in range(sections))
+
+
+def test_dense_page_is_chunked_by_its_measured_token_count(cache):
+    client = DenseTokenClient()
+    content = url_page(sections=30, lines_per_section=50) # ~54k tokens by the client's count
+    limit = request_token_limit(MODEL, 16000)
+    assert client.count_tokens(MODEL, content) > 3 * limit
+    assert len(content) // CHARS_PER_TOKEN < 2 * limit # The local estimate alone would not see that
+
+    text, from_cache, _, sections = run_analysis(PROMPT_TEMPLATE, content, "Clarity", MODEL, cache, client,
+                                                 request_token_limit=limit)
+    assert sections > 3
+    assert len(client.prompts) == sections + 1 # One call per section, then the reduce call
+    assert all(client.count_tokens(MODEL, prompt) <= limit for prompt in client.prompts[:-1])
+    assert text == f"findings {sections + 1}" and not from_cache
+
+
+def test_rerun_reuses_the_measured_count_and_every_cached_section(cache):
+    client = DenseTokenClient()
+    content = url_page(sections=30, lines_per_section=50)
+    limit = request_token_limit(MODEL, 16000)
+    first = run_analysis(PROMPT_TEMPLATE, content, "Clarity", MODEL, cache, client, request_token_limit=limit)
+    calls, counted = len(client.prompts), client.counted
+    # The count API is now down, but the rerun needs neither it nor the model
+    client.count_error = RuntimeError("count_tokens unavailable")
+    text, from_cache, _, sections = run_analysis(PROMPT_TEMPLATE, content, "Clarity", MODEL, cache, client,
+                                                 request_token_limit=limit)
+    assert (text, from_cache, sections) == (first[0], True, first[3])
+    assert (len(client.prompts), client.counted) == (calls, counted)
+
+
+def test_failed_count_does_not_chunk_with_the_estimate(cache):
+    client = DenseTokenClient()
+    client.count_error = RuntimeError("count_tokens unavailable")
+    with pytest.raises(RuntimeError):
+        run_analysis(PROMPT_TEMPLATE, url_page(sections=30, lines_per_section=50), "Clarity", MODEL, cache, client,
+                     request_token_limit=request_token_limit(MODEL, 16000))
+    assert client.prompts == []
+
+
+def test_single_chunk_skips_map_reduce(cache):
+    client = DenseTokenClient(chars_per_token=CHARS_PER_TOKEN)
+    content = url_page(sections=1, lines_per_section=5)
+    # The content fits the budget on its own; only the prompt around it pushes the request over
+    template = "Instructions. " * 3000 + PROMPT_TEMPLATE
+    text, _, _, sections = run_analysis(template, content, "Clarity", MODEL, cache, client,
+                                        request_token_limit=request_token_limit(MODEL, 8000))
+    assert sections == 1
+    assert client.prompts == [template.format(user_content=content)]
+    assert text == "findings 1"
+
+
+@pytest.mark.parametrize("limit", [None, 30720])
+def test_small_page_is_one_call(cache, limit):
+    client = DenseTokenClient()
+    content = url_page(sections=2, lines_per_section=3)
+    _, _, _, sections = run_analysis(PROMPT_TEMPLATE, content, "Clarity", MODEL, cache, client,
+                                     request_token_limit=limit)
+    assert sections == 1 and len(client.prompts) == 1
+
+
+def test_reordered_sections_reuse_the_previous_analysis(cache, tmp_path):
+    client = DenseTokenClient()
+    store = PageStateStore(str(tmp_path / "state.sqlite3"))
+    url = "https://example.com/guide"
+    sections = ["## Grind\nUse a coarse grind.", "## Steep\nSteep for sixteen hours.", "## Serve\nDilute one to one."]
+
+    def audit(text):
+        return run_incremental_analysis(PROMPT_TEMPLATE, text, "Clarity", MODEL, cache, client, store, url)
+
+    first, _, _, _, change = audit("\n".join(sections))
+    assert change == "full"
+    reordered = "\n\n".join(reversed(sections)) # Different page hash, same sections
+    text, from_cache, _, section_count, change = audit(reordered)
+    assert (text, from_cache, section_count, change) == (first, True, 0, "unchanged")
+    assert len(client.prompts) == 1
+    assert store.get_analysis(url, "Clarity", MODEL)["content_hash"] == content_hash(reordered)